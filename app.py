@@ -1,18 +1,158 @@
 from project import create_app, db
 from project.models import User, Todo
+from project.utils import rebuild_daily_completion, check_daily_completion
+from project.server import WORKER_CLASSES, default_workers, engine_options, dispose_engines, run_server
+from project.schema import upgrade, SCHEMA_VERSION
+from project.search import rebuild_search_index
+from project.archive import archive_completed_todos, ARCHIVE_BATCH_SIZE
+import os
+import re
+import subprocess
+import sys
+import tempfile
 import click
 from flask.cli import with_appcontext
 
 app = create_app()
 
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_db_command():
+    """데이터베이스 스키마를 최신 버전으로 생성/업그레이드합니다."""
+    previous, current = upgrade()
+    if previous is None:
+        click.echo(f'Initialized the database (schema version {current}).')
+    elif previous == current:
+        click.echo(f'Database schema is up to date (version {current}).')
+    else:
+        click.echo(f'Upgraded database schema from version {previous} to {current}.')
+
 @click.command('init-db')
+@click.pass_context
+def init_db_command(ctx):
+    """upgrade-db 의 이전 이름입니다."""
+    ctx.invoke(upgrade_db_command)
+
+@click.command('profile-startup')
+@click.option('--top', default=15, show_default=True, help='표시할 import 항목 수')
+def profile_startup_command(top):
+    """워커 콜드 스타트 비용(import 시간, create_app 단계별 시간)을 측정합니다."""
+    # 새 인터프리터에서 측정해야 이미 import 된 모듈의 영향을 받지 않습니다.
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import project'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)', line)
+        if match:
+            imports.append((int(match.group(2)), int(match.group(1)), match.group(4)))
+    imports.sort(reverse=True)
+
+    click.echo(f'Top {top} imports by cumulative time:')
+    for cumulative, self_time, module in imports[:top]:
+        click.echo(f'  {cumulative / 1000:8.1f} ms  (self {self_time / 1000:6.1f} ms)  {module}')
+
+    # 이 프로세스에서 CLI 가 로드될 때 만든 앱의 create_app 단계별 시간
+    click.echo('create_app phases:')
+    for phase, seconds in app.extensions['startup_timings']:
+        click.echo(f'  {seconds * 1000:8.1f} ms  {phase}')
+    click.echo(f'Schema version: {app.extensions.get("schema_version")} (expected {SCHEMA_VERSION})')
+
+@click.command('rebuild-lawn')
+@click.option('--check', is_flag=True, help='재구성하지 않고 불일치만 확인합니다.')
+@click.option('--user-id', type=int, default=None, help='특정 사용자만 대상으로 합니다.')
 @with_appcontext
-def init_db_command():
-    """데이터베이스 테이블을 생성합니다."""
-    db.create_all()
-    click.echo('Initialized the database.')
+def rebuild_lawn_command(check, user_id):
+    """todo 테이블로부터 잔디밭 일별 집계(daily_completion)를 재구성하거나 검사합니다."""
+    if check:
+        mismatches = check_daily_completion(user_id)
+        for uid, day, stored, real in mismatches:
+            click.echo(f'user={uid} day={day} stored={stored} actual={real}')
+        if mismatches:
+            raise click.ClickException(f'{len(mismatches)} mismatched rows.')
+        click.echo('Lawn rollup is consistent.')
+        return
+
+    rows = rebuild_daily_completion(user_id)
+    db.session.commit()
+    click.echo(f'Rebuilt lawn rollup ({rows} rows).')
+
+@click.command('rebuild-search')
+@click.option('--user-id', type=int, default=None, help='특정 사용자만 대상으로 합니다.')
+@with_appcontext
+def rebuild_search_command(user_id):
+    """todo 와 todo_archive 테이블로부터 내용 검색 색인(todo_search_token)을 재구성합니다."""
+    count = rebuild_search_index(user_id)
+    db.session.commit()
+    click.echo(f'Rebuilt search index ({count} todos).')
+
+@click.command('archive-todos')
+@click.option('--days', type=int, default=lambda: int(os.getenv('ARCHIVE_AFTER_DAYS', 90)), show_default='90',
+              help='완료된 지 이 일수가 지난 할 일을 보관합니다.')
+@click.option('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, show_default=True,
+              help='한 트랜잭션에서 옮길 할 일 수')
+@with_appcontext
+def archive_todos_command(days, batch_size):
+    """오래된 완료 할 일을 todo 에서 todo_archive 로 옮깁니다. (cron 등으로 주기 실행)"""
+    if days < 1 or batch_size < 1:
+        raise click.BadParameter('--days 와 --batch-size 는 1 이상이어야 합니다.')
+    count = archive_completed_todos(days, batch_size)
+    click.echo(f'Archived {count} todos completed more than {days} days ago.')
+
+@click.command('serve')
+@click.option('--host', default=lambda: os.getenv('FLASK_RUN_HOST', '0.0.0.0'), show_default='0.0.0.0')
+@click.option('--port', type=int, default=lambda: int(os.getenv('FLASK_RUN_PORT', 5000)), show_default='5000')
+@click.option('--workers', '-w', type=int, default=lambda: int(os.getenv('WEB_WORKERS', default_workers())),
+              show_default='2 * 사용 가능한 CPU + 1', help='워커 프로세스 수')
+@click.option('--worker-class', '-k', type=click.Choice(sorted(WORKER_CLASSES)),
+              default=lambda: os.getenv('WEB_WORKER_CLASS', 'thread'), show_default='thread')
+@click.option('--threads', type=int, default=lambda: int(os.getenv('WEB_THREADS', 4)), show_default='4',
+              help='워커당 스레드 수 (thread 모드)')
+@click.option('--connections', type=int, default=lambda: int(os.getenv('WEB_CONNECTIONS', 100)), show_default='100',
+              help='워커당 동시 연결 수 (gevent 모드)')
+@click.option('--timeout', default=30, show_default=True, help='응답 없는 워커를 재시작하기까지의 시간(초)')
+@click.option('--graceful-timeout', default=30, show_default=True, help='종료 시 진행 중인 요청을 기다리는 시간(초)')
+@with_appcontext
+def serve_command(host, port, workers, worker_class, threads, connections, timeout, graceful_timeout):
+    """운영용 멀티 워커 서버(gunicorn)를 실행합니다."""
+    from flask import current_app
+
+    max_connections = current_app.config.get('DB_MAX_CONNECTIONS', 100)
+    try:
+        pool = engine_options(current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+                              current_app.config['SQLALCHEMY_DATABASE_URI'],
+                              worker_class, threads, connections, workers, max_connections)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Starting {workers} {worker_class} workers on {host}:{port} '
+               f'(pool_size={pool["pool_size"]}, max_overflow={pool["max_overflow"]}, '
+               f'pool_recycle={pool["pool_recycle"]}, '
+               f'max {workers * (pool["pool_size"] + pool["max_overflow"])}/{max_connections} connections)')
+
+    # fork 전에 마스터 프로세스의 커넥션을 닫아 워커가 소켓을 공유하지 않게 합니다.
+    dispose_engines(current_app)
+    try:
+        # long-poll 대기 요청은 스레드 모드에서 워커 스레드를 붙잡으므로 gevent 모드에서만 허용합니다.
+        app_config = {'SQLALCHEMY_ENGINE_OPTIONS': pool, 'CHANGES_LONG_POLL': worker_class == 'gevent'}
+        # 워커별 지표를 /metrics 한 곳에서 내보내도록 스냅샷 디렉터리를 정하고, 이전 실행의 스냅샷은 지웁니다.
+        metrics_dir = current_app.config.get('METRICS_DIR') or tempfile.mkdtemp(prefix='lawn-todo-metrics-')
+        for name in os.listdir(metrics_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+        app_config['METRICS_DIR'] = metrics_dir
+        run_server(app_config, f'{host}:{port}', workers, worker_class,
+                   threads, connections, timeout, graceful_timeout)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
 
+app.cli.add_command(upgrade_db_command)
 app.cli.add_command(init_db_command)
+app.cli.add_command(profile_startup_command)
+app.cli.add_command(rebuild_lawn_command)
+app.cli.add_command(rebuild_search_command)
+app.cli.add_command(archive_todos_command)
+app.cli.add_command(serve_command)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
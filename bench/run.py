@@ -0,0 +1,313 @@
+"""Lawn-Todo 성능 벤치마크.
+
+create_app 을 SQLite 로 띄우고 재현 가능한(seed 고정) 데이터셋을 만든 뒤, Flask 테스트 클라이언트로
+로그인, /, /lawn/, /add/, /complete/<id>/, /search/ 를 호출해 지연 시간 백분위수, 요청당 SQL 문 수,
+최대 메모리 사용량을 측정합니다. 저장된 기준값(baseline)보다 나빠지면 종료 코드 1 로 끝납니다.
+
+    python -m bench.run                                   # 기본 데이터셋으로 측정 후 baseline 과 비교
+    python -m bench.run --users 10000 --todos-per-user 5000
+    python -m bench.run --update-baseline                 # 현재 결과를 baseline 으로 저장
+
+지연 시간은 실행하는 기계에 따라 달라지므로 baseline 은 같은 환경에서 갱신해야 합니다.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from project import create_app  # noqa: E402
+from project.models import db, User, Todo  # noqa: E402
+from project.schema import upgrade  # noqa: E402
+from project.search import rebuild_search_index  # noqa: E402
+from project.utils import rebuild_daily_completion  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+PASSWORD = 'bench-password'
+SEED_BATCH_SIZE = 5000
+SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help='생성할 사용자 수')
+    parser.add_argument('--todos-per-user', type=int, default=2000, help='사용자당 할 일 수')
+    parser.add_argument('--requests', type=int, default=200, help='시나리오별 요청 수')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='시나리오별 측정 반복 횟수 (백분위수는 회차별 값의 중앙값)')
+    parser.add_argument('--memory-requests', type=int, default=20, help='메모리 측정용 시나리오별 요청 수')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:10000',
+                        help='벤치마크용 비밀번호 해시 방식 (운영 비용으로 측정하려면 pbkdf2:sha256)')
+    parser.add_argument('--db', help='SQLite 파일 경로 (기본: 임시 파일)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='지연 시간/메모리 허용 증가율 (0.25 = 25%%)')
+    return parser.parse_args(argv)
+
+
+def make_app(db_path, hash_method):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SECRET_KEY': 'bench',
+        'PERF_INSTRUMENTATION': True,
+        'SLOW_QUERY_MS': float('inf'),
+        'PASSWORD_HASH_METHOD': hash_method,
+        'SCHEMA_CHECK': 'off',
+    })
+    with app.app_context():
+        upgrade()
+    return app
+
+
+def seed(app, users, todos_per_user, rng, hash_method):
+    """완료 기록이 1년에 걸쳐 분포된 데이터셋을 executemany 로 빠르게 채웁니다."""
+    password = generate_password_hash(PASSWORD, hash_method)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.session.execute(db.insert(User), [
+            {'username': f'bench{i}', 'password': password} for i in range(users)
+        ])
+        usernames = dict(db.session.query(User.id, User.username).order_by(User.id).all())
+        user_ids = list(usernames)
+
+        batch = []
+        for user_id in user_ids:
+            # 사용자마다 활동량이 다르도록 완료 비율을 다르게 줍니다.
+            completion_rate = rng.uniform(0.3, 0.9)
+            for i in range(todos_per_user):
+                created_at = now - timedelta(days=rng.uniform(0, 365))
+                completed = rng.random() < completion_rate
+                completed_at = None
+                if completed:
+                    completed_at = min(now, created_at + timedelta(days=rng.expovariate(1 / 3)))
+                due_date = None
+                if rng.random() < 0.4:
+                    due_date = (created_at + timedelta(days=rng.randint(0, 30))).date()
+                batch.append({
+                    'user_id': user_id,
+                    'content': f'bench todo {i}',
+                    'completed': completed,
+                    'completed_at': completed_at,
+                    'important': rng.random() < 0.2,
+                    'due_date': due_date,
+                    'created_at': created_at,
+                })
+                if len(batch) >= SEED_BATCH_SIZE:
+                    db.session.execute(db.insert(Todo), batch)
+                    batch = []
+        if batch:
+            db.session.execute(db.insert(Todo), batch)
+
+        rebuild_daily_completion()
+        rebuild_search_index()
+        db.session.commit()
+
+        todo_ids = {}
+        for user_id, todo_id in db.session.query(Todo.user_id, Todo.id):
+            todo_ids.setdefault(user_id, []).append(todo_id)
+    return usernames, todo_ids
+
+
+class Runner:
+    def __init__(self, app, usernames, todo_ids, rng):
+        self.app = app
+        self.usernames = usernames
+        self.user_ids = list(usernames)
+        self.todo_ids = todo_ids
+        self.rng = rng
+        self.clients = {}
+
+    def client_for(self, user_id):
+        client = self.clients.get(user_id)
+        if client is None:
+            client = self.app.test_client()
+            self.login(client, user_id)
+            self.clients[user_id] = client
+        return client
+
+    def login(self, client, user_id):
+        response = client.post('/login/', data={'username': self.usernames[user_id], 'password': PASSWORD})
+        assert response.status_code == 302, f'login failed: {response.status_code}'
+        return response
+
+    def scenarios(self):
+        rng = self.rng
+        return {
+            'login': lambda user_id: self.login(self.app.test_client(), user_id),
+            'index': lambda user_id: self.client_for(user_id).get('/'),
+            'lawn': lambda user_id: self.client_for(user_id).get('/lawn/'),
+            'add': lambda user_id: self.client_for(user_id).post(
+                '/add/', json={'content': 'bench add', 'important': rng.random() < 0.2}),
+            'complete': lambda user_id: self.client_for(user_id).post(
+                f'/complete/{rng.choice(self.todo_ids[user_id])}/'),
+            'search': lambda user_id: self.client_for(user_id).get(
+                '/search/', query_string={'q': f'todo {rng.randrange(len(self.todo_ids[user_id]))}'}),
+        }
+
+    def measure(self, name, request, count):
+        latencies = []
+        statements = []
+        # 측정 중 GC 일시 정지가 p95/p99 에 잡음으로 섞이지 않게 합니다.
+        gc.collect()
+        gc.disable()
+        try:
+            self._measure(name, request, count, latencies, statements)
+        finally:
+            gc.enable()
+        return latencies, statements
+
+    def _measure(self, name, request, count, latencies, statements):
+        for _ in range(count):
+            user_id = self.rng.choice(self.user_ids)
+            started = time.perf_counter()
+            response = request(user_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: HTTP {response.status_code}')
+            match = SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+            if match:
+                statements.append(int(match.group(1)))
+
+    def measure_memory(self, request, count):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(count):
+            request(self.rng.choice(self.user_ids))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak - baseline
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    tmpdir = None
+    db_path = args.db
+    if db_path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmpdir.name, 'bench.db')
+
+    app = make_app(db_path, args.hash_method)
+    started = time.perf_counter()
+    usernames, todo_ids = seed(app, args.users, args.todos_per_user, rng, args.hash_method)
+    print(f'Seeded {args.users} users x {args.todos_per_user} todos in {time.perf_counter() - started:.1f}s')
+
+    runner = Runner(app, usernames, todo_ids, rng)
+    # 로그인된 클라이언트를 미리 만들고 페이지를 한 번씩 열어, 측정에 로그인 비용과
+    # 첫 렌더링(캐시 미스)이 섞이지 않은 정상 상태에서 측정합니다.
+    for user_id in runner.user_ids:
+        client = runner.client_for(user_id)
+        client.get('/')
+        client.get('/lawn/')
+
+    results = {}
+    for name, request in runner.scenarios().items():
+        # 한 회차의 일시적인 잡음에 흔들리지 않도록 회차별 백분위수의 중앙값을 씁니다.
+        rounds = []
+        statements = []
+        for _ in range(args.rounds):
+            latencies, round_statements = runner.measure(name, request, args.requests)
+            rounds.append(latencies)
+            statements.extend(round_statements)
+        peak = runner.measure_memory(request, args.memory_requests)
+        results[name] = {
+            'p50_ms': round(statistics.median(percentile(r, 50) for r in rounds), 3),
+            'p95_ms': round(statistics.median(percentile(r, 95) for r in rounds), 3),
+            'p99_ms': round(statistics.median(percentile(r, 99) for r in rounds), 3),
+            'statements': round(statistics.mean(statements), 2) if statements else None,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    if tmpdir is not None:
+        with app.app_context():
+            db.engine.dispose()
+        tmpdir.cleanup()
+    return results
+
+
+def print_results(results):
+    print(f'{"scenario":<10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"stmts":>7} {"peak KB":>10}')
+    for name, r in results.items():
+        stmts = '-' if r['statements'] is None else f'{r["statements"]:.2f}'
+        print(f'{name:<10} {r["p50_ms"]:>9.2f} {r["p95_ms"]:>9.2f} {r["p99_ms"]:>9.2f} {stmts:>7} {r["peak_memory_kb"]:>10.1f}')
+
+
+def dataset_key(args):
+    return {'users': args.users, 'todos_per_user': args.todos_per_user, 'seed': args.seed,
+            'requests': args.requests, 'rounds': args.rounds, 'memory_requests': args.memory_requests, 'hash_method': args.hash_method}
+
+
+def compare(results, baseline, tolerance):
+    """baseline 대비 회귀 목록을 반환합니다. SQL 문 수는 허용 오차 없이 비교합니다."""
+    regressions = []
+    for name, expected in baseline['results'].items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        for key in ('p95_ms', 'peak_memory_kb'):
+            limit = expected[key] * (1 + tolerance)
+            if actual[key] > limit:
+                regressions.append(f'{name}.{key}: {actual[key]} > {limit:.2f} (baseline {expected[key]})')
+        if expected['statements'] is not None and actual['statements'] is not None:
+            if actual['statements'] > expected['statements'] + 0.5:
+                regressions.append(f'{name}.statements: {actual["statements"]} > {expected["statements"]}')
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    print_results(results)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'dataset': dataset_key(args), 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline found; run with --update-baseline to create one.')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('dataset') != dataset_key(args):
+        print(f'Baseline dataset {baseline.get("dataset")} differs from this run; skipping comparison.')
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('Performance regressions:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print('No regressions against baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
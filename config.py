@@ -14,3 +14,42 @@ class Config:
     
     SQLALCHEMY_DATABASE_URI = f'mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Schema version check at startup: 'warn' | 'strict' | 'off' (DDL 은 `flask upgrade-db` 로만 실행)
+    SCHEMA_CHECK = os.getenv('SCHEMA_CHECK', 'warn')
+    # create_app 단계별 소요 시간 로그
+    STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', '0') == '1'
+
+    # Performance instrumentation (Server-Timing 헤더, 느린 쿼리 로그, /metrics)
+    PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', '0') == '1'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # 워커별 지표 스냅샷 디렉터리 (멀티 워커에서 /metrics 가 모든 워커의 지표를 내보내도록, `flask serve` 는 자동 설정)
+    METRICS_DIR = os.getenv('METRICS_DIR')
+
+    # 배포 식별자 (페이지 ETag 에 포함). 비어 있으면 템플릿 소스의 해시를 사용합니다.
+    BUILD_ID = os.getenv('BUILD_ID')
+
+    # /todos/changes/ long-poll 허용 여부. 대기 중인 요청이 스레드를 붙잡으므로 gevent 워커에서만 켭니다.
+    # (`flask serve -k gevent` 는 자동으로 켜고, 스레드 모드는 끕니다. 꺼져 있으면 클라이언트는 주기적으로 조회합니다.)
+    CHANGES_LONG_POLL = os.getenv('CHANGES_LONG_POLL', '0') == '1'
+
+    # Password hashing (요청 워커가 아닌 전용 풀에서 실행, 대기열이 차면 503)
+    # 해시 방식/비용을 바꾸면 기존 사용자는 다음 로그인 때 새 설정으로 다시 해싱됩니다.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+
+    # Connection pool (MariaDB 가 유휴 커넥션을 끊기 전에 재활용하고, 사용 전 ping 으로 확인)
+    # `flask serve` 는 워커/스레드 수에 맞춰 이 값을 덮어씁니다.
+    # DB_MAX_CONNECTIONS: `flask serve` 의 모든 워커가 합쳐서 여는 커넥션 상한.
+    # MariaDB max_connections(기본 151)보다 작게, CLI/관리용 여유를 남겨 둡니다.
+    DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', 100))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_pre_ping': True,
+    }
@@ -1,19 +1,38 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+import logging
 import os
+import time
 from .models import db
 from .auth import login_manager
+from .hashing import password_hasher
+from .metrics import perf_metrics
+from .schema import check_schema
+
+logger = logging.getLogger(__name__)
+
+def create_app(config=None):
+    started = time.perf_counter()
+    timings = []
+
+    def mark(phase):
+        timings.append((phase, time.perf_counter() - started - sum(t for _, t in timings)))
 
-def create_app():
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
     # Load config
     app.config.from_object('config.Config')
+    if config:
+        app.config.update(config)
+    mark('config')
 
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
+    password_hasher.init_app(app)
+    perf_metrics.init_app(app)
+    mark('extensions')
 
     with app.app_context():
         from . import main, auth, models
@@ -21,8 +40,16 @@ def create_app():
         # Register Blueprints
         app.register_blueprint(auth.auth_bp)
         app.register_blueprint(main.main_bp)
+    mark('blueprints')
+
+    # 스키마는 `flask upgrade-db` 로만 변경하고, 시작 시에는 버전만 한 번 확인합니다.
+    check_schema(app)
+    mark('schema_check')
 
-        # Create database tables if they don't exist
-        db.create_all()
+    app.extensions['startup_timings'] = timings
+    if app.config.get('STARTUP_PROFILE'):
+        logger.warning('create_app: %s (total %.1f ms)',
+                       ', '.join(f'{phase}={seconds * 1000:.1f}ms' for phase, seconds in timings),
+                       sum(t for _, t in timings) * 1000)
 
     return app
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from .models import db, Todo, TodoArchive
+from .utils import bump_daily_completion, next_change_version
+
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_PAGE_SIZE = 50
+
+# todo 와 todo_archive 에 공통인 컬럼 (보관/복원 시 그대로 옮깁니다)
+ARCHIVE_FIELDS = ('id', 'content', 'completed', 'important', 'due_date', 'user_id',
+                  'created_at', 'completed_at', 'version')
+
+
+def archive_completed_todos(days, batch_size=ARCHIVE_BATCH_SIZE, now=None):
+    """완료된 지 days 일이 지난 할 일을 batch_size 개씩 todo_archive 로 옮기고 옮긴 개수를 반환합니다.
+
+    배치마다 커밋하므로 한 번에 잡는 잠금과 트랜잭션 크기가 batch_size 로 제한됩니다.
+    완료 집계와 검색 색인은 그대로 둡니다(보관된 할 일도 검색됨). 변경 버전은 올리지 않으므로
+    이미 목록을 받은 클라이언트에는 새로 고칠 때까지 남아 있습니다.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    archived = 0
+    while True:
+        # 옮긴 행은 todo 에서 지워지므로 매번 completed_at 인덱스의 앞부분부터 다시 읽으면 됩니다.
+        # 옮기는 동안 사용자가 완료를 취소하지 못하도록 행을 잠급니다. (SQLite 는 FOR UPDATE 를 무시)
+        ids = db.session.scalars(
+            db.select(Todo.id).where(Todo.completed_at < cutoff)
+            .order_by(Todo.completed_at, Todo.id).limit(batch_size).with_for_update()
+        ).all()
+        if not ids:
+            return archived
+
+        # 잠금이 없는 백엔드에서도 그 사이 완료가 취소된 할 일은 옮기지 않도록 조건을 다시 겁니다.
+        still_old = db.and_(Todo.id.in_(ids), Todo.completed_at < cutoff)
+        columns = [getattr(Todo, field) for field in ARCHIVE_FIELDS]
+        db.session.execute(db.insert(TodoArchive).from_select(
+            list(ARCHIVE_FIELDS) + ['archived_at'],
+            db.select(*columns, db.literal(datetime.utcnow(), db.DateTime)).where(still_old)
+        ))
+        moved = db.session.execute(db.delete(Todo).where(still_old)).rowcount
+        db.session.commit()
+        archived += moved
+
+
+def get_archive_page(user_id, before_id=None, limit=ARCHIVE_PAGE_SIZE):
+    """보관된 할 일을 id 역순으로 반환합니다. (todos, 다음 페이지 커서)"""
+    query = TodoArchive.query.filter(TodoArchive.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(TodoArchive.id < before_id)
+    todos = query.order_by(TodoArchive.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        next_cursor = todos[-1].id
+    return todos, next_cursor
+
+
+def restore_archived_todo(archived):
+    """보관된 할 일을 같은 id 로 todo 에 되돌립니다. 완료 취소로 처리합니다. 커밋은 호출한 쪽에서 합니다.
+
+    검색 색인은 보관 중에도 남아 있으므로 다시 만들지 않습니다.
+    """
+    if archived.completed_at:
+        bump_daily_completion(archived.user_id, archived.completed_at.date(), -1)
+    todo = Todo(**{field: getattr(archived, field) for field in ARCHIVE_FIELDS})
+    todo.completed = False
+    todo.completed_at = None
+    todo.version = next_change_version(archived.user_id)
+    db.session.delete(archived)
+    db.session.add(todo)
+    db.session.flush()
+    return todo
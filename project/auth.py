@@ -1,7 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, current_user, LoginManager
-from werkzeug.security import generate_password_hash, check_password_hash
 from .models import db, User
+from .cache import LRUCache
+from .hashing import password_hasher, HashingBusy
+
+USER_CACHE_SIZE = 4096
+USER_CACHE_TTL = 60  # 초
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -10,9 +14,52 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = "로그인이 필요한 서비스입니다."
 login_manager.login_message_category = "warning"
 
+class SessionUser:
+    """요청마다 로드되는 가벼운 로그인 사용자 정보 (id, username 만 보관합니다)."""
+    __slots__ = ('id', 'username')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, SessionUser) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+_user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(user_id):
+    """로그아웃이나 사용자 이름/비밀번호 변경 시 캐시된 세션 사용자 정보를 버립니다."""
+    _user_cache.pop(int(user_id))
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    user = _user_cache.get(user_id)
+    if user is None:
+        row = db.session.query(User.id, User.username).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user = SessionUser(row.id, row.username)
+        _user_cache.set(user_id, user)
+    return user
+
+
+def _hashing_busy(template):
+    flash('요청이 많아 잠시 후 다시 시도해주세요.', 'warning')
+    return render_template(template), 503, {'Retry-After': '1'}
 
 @auth_bp.route('/login/', methods=['GET', 'POST'])
 def login():
@@ -22,7 +69,18 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password):
+        try:
+            valid = user is not None and password_hasher.verify(user.password, password)
+        except HashingBusy:
+            return _hashing_busy('login.html')
+        if valid:
+            # 설정된 해시 방식/비용이 바뀌었으면 로그인 시 다시 해싱해 저장합니다.
+            if password_hasher.needs_rehash(user.password):
+                try:
+                    user.password = password_hasher.hash(password)
+                    db.session.commit()
+                except HashingBusy:
+                    pass
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page or url_for('main.index'))
@@ -48,7 +106,10 @@ def signup():
             flash('이미 존재하는 사용자 이름입니다.', 'warning')
             return redirect(url_for('auth.signup'))
 
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+        try:
+            hashed_password = password_hasher.hash(password)
+        except HashingBusy:
+            return _hashing_busy('signup.html')
         new_user = User(username=username, password=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -58,5 +119,7 @@ def signup():
 
 @auth_bp.route('/logout/')
 def logout():
+    if current_user.is_authenticated:
+        invalidate_user(current_user.id)
     logout_user()
     return redirect(url_for('auth.login'))
@@ -0,0 +1,114 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+class HashingBusy(Exception):
+    """해싱 풀의 대기열이 가득 찼거나 제한 시간 안에 끝나지 않았을 때 발생합니다."""
+
+
+def _gevent_patched():
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def normalize_method(method):
+    """'pbkdf2:sha256' 처럼 생략된 파라미터를 werkzeug 기본값으로 채워 저장된 해시의 접두사와 비교할 수 있게 합니다."""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        if len(parts) == 1:
+            parts.append('sha256')
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    elif parts[0] == 'scrypt' and len(parts) == 1:
+        parts.extend(['32768', '8', '1'])
+    return ':'.join(parts)
+
+
+class PasswordHasher:
+    """비밀번호 해싱/검증을 요청 워커가 아닌 크기가 제한된 전용 스레드 풀에서 실행합니다.
+
+    실행 중 + 대기 중인 작업 수가 workers + queue_depth 를 넘으면 기다리지 않고
+    HashingBusy 를 발생시켜, 로그인 폭주가 다른 요청을 막지 않도록 합니다.
+    """
+
+    def __init__(self, app=None):
+        self.method = normalize_method('pbkdf2:sha256')
+        self.workers = 2
+        self.queue_depth = 16
+        self.timeout = 5.0
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = normalize_method(app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'))
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.queue_depth = app.config.get('PASSWORD_HASH_QUEUE_DEPTH', self.queue_depth)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self.shutdown()
+        app.extensions['password_hasher'] = self
+
+    def _ensure_pool(self):
+        # fork 이후 워커 프로세스에서 처음 사용할 때 풀을 만듭니다.
+        with self._lock:
+            if self._pool is None:
+                if _gevent_patched():
+                    # 패치된 threading 은 그린렛이므로 gevent 의 네이티브 스레드 풀을 사용합니다.
+                    from gevent.threadpool import ThreadPool
+                    self._pool = ThreadPool(self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+            return self._pool
+
+    def _run(self, fn, *args):
+        pool = self._ensure_pool()
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+
+        if isinstance(pool, ThreadPoolExecutor):
+            try:
+                future = pool.submit(fn, *args)
+            except RuntimeError:
+                # 풀이 종료된 뒤 제출된 경우
+                self._slots.release()
+                raise HashingBusy()
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise HashingBusy()
+
+        from gevent import Timeout
+        result = pool.spawn(fn, *args)
+        result.rawlink(lambda _: self._slots.release())
+        try:
+            return result.get(timeout=self.timeout)
+        except Timeout:
+            raise HashingBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """저장된 해시의 알고리즘/비용이 현재 설정과 다르면 True."""
+        return pwhash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if isinstance(pool, ThreadPoolExecutor):
+            pool.shutdown(wait=False)
+        elif pool is not None:
+            pool.kill()
+
+
+password_hasher = PasswordHasher()
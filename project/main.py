@@ -1,35 +1,162 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, make_response,
+    Response, stream_with_context, current_app, abort
+)
 from flask_login import login_required, current_user
-from .models import db, Todo
+from .models import db, Todo, TodoArchive
 from datetime import datetime
-from .utils import get_lawn_data
+import time
+from .utils import (
+    bump_daily_completion, get_lawn_version, get_template_version, render_lawn_fragment,
+    get_todo_page, TODO_PAGE_SIZE, TODO_PAGE_SIZE_MAX,
+    apply_todo_batch, BATCH_OPERATIONS, BATCH_MAX_IDS,
+    next_change_version, get_change_version, add_tombstones, get_changes
+)
+from .transfer import iter_export, import_todos, ImportValidationError, FORMATS
+from .archive import get_archive_page, restore_archived_todo, ARCHIVE_PAGE_SIZE
+from .search import index_todo, reindex_todo, unindex_todos, search_todos, SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE_MAX
+
+CHANGES_MAX_WAIT = 25  # 초 (long-poll)
+CHANGES_POLL_INTERVAL = 1
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 @login_required
 def index():
-    todos = Todo.query.filter_by(user_id=current_user.id).order_by(
-        Todo.completed.asc(),
-        Todo.due_date.is_(None),
-        Todo.due_date.asc(),
-        Todo.important.desc(),
-        Todo.created_at.desc()
-    ).all()
+    # 목록보다 먼저 버전을 읽어야 그 사이의 변경을 /todos/changes/ 에서 놓치지 않습니다.
+    sync_version = get_change_version(current_user.id)
+    # 첫 페이지만 서버에서 렌더링하고 나머지는 /todos/ 로 스크롤 시 불러옵니다.
+    todos, next_cursor = get_todo_page(current_user.id)
     
     from datetime import date
-    current_year = date.today().year
-    weeks, month_weeks, today = get_lawn_data(current_year)
+    today = date.today()
+    lawn_html = render_lawn_fragment('small', today.year)
     
-    return render_template('index.html', todos=todos, today=today, weeks=weeks, month_weeks=month_weeks)
+    sync_wait = CHANGES_MAX_WAIT if current_app.config.get('CHANGES_LONG_POLL') else 0
+    return render_template('index.html', todos=todos, next_cursor=next_cursor, sync_version=sync_version,
+                           sync_wait=sync_wait, today=today, lawn_html=lawn_html)
+
+@main_bp.route('/todos/')
+@login_required
+def list_todos():
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', TODO_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, TODO_PAGE_SIZE_MAX))
+    try:
+        todos, next_cursor = get_todo_page(current_user.id, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'todos': [todo.to_dict() for todo in todos], 'next_cursor': next_cursor})
+
+@main_bp.route('/todos/changes/')
+@login_required
+def todo_changes():
+    """since 버전 이후 변경된 할 일과 삭제된 id 만 반환합니다.
+
+    CHANGES_LONG_POLL 이 켜져 있으면(gevent 워커) wait 초 동안 변경을 기다릴 수 있고(long-poll),
+    꺼져 있으면 wait 를 무시하고 바로 응답합니다.
+    """
+    since = request.args.get('since', 0, type=int)
+    wait = 0
+    if current_app.config.get('CHANGES_LONG_POLL'):
+        wait = max(0, min(request.args.get('wait', 0, type=int), CHANGES_MAX_WAIT))
+
+    deadline = time.monotonic() + wait
+    while get_change_version(current_user.id) <= since and time.monotonic() < deadline:
+        # 트랜잭션을 끝내야 다음 조회에서 새로 커밋된 버전을 볼 수 있습니다.
+        db.session.rollback()
+        time.sleep(CHANGES_POLL_INTERVAL)
+
+    return jsonify(get_changes(current_user.id, since))
+
+def _parse_flag(value):
+    if value in (None, ''):
+        return None
+    if value in ('1', 'true'):
+        return True
+    if value in ('0', 'false'):
+        return False
+    raise ValueError('true 또는 false 여야 합니다.')
+
+def _parse_search_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('날짜 형식이 올바르지 않습니다.')
+
+@main_bp.route('/search/')
+@login_required
+def search():
+    """내용 검색. q 의 모든 단어를 포함하는 할 일을 최신순으로 반환합니다.
+
+    completed/important(true|false), due_before/due_after(YYYY-MM-DD) 로 거르고,
+    응답의 next_cursor 를 cursor 로 넘기면 다음 페이지를 받습니다.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '검색어를 입력해주세요.'}), 400
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SEARCH_PAGE_SIZE_MAX))
+    try:
+        todos, next_cursor = search_todos(
+            current_user.id, query,
+            completed=_parse_flag(request.args.get('completed')),
+            important=_parse_flag(request.args.get('important')),
+            due_before=_parse_search_date(request.args.get('due_before')),
+            due_after=_parse_search_date(request.args.get('due_after')),
+            before_id=request.args.get('cursor', type=int),
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'todos': [todo.to_dict() for todo in todos], 'next_cursor': next_cursor})
 
 @main_bp.route('/lawn/')
 @login_required
 def lawn():
     from datetime import date
     current_year = date.today().year
-    weeks, month_weeks, today = get_lawn_data(current_year)
-    return render_template('lawn.html', weeks=weeks, today=today, month_weeks=month_weeks)
+    version, updated_at = get_lawn_version(current_user.id)
+
+    # 잔디밭과 템플릿(배포)이 바뀌지 않았으면 렌더링 없이 304 (대기 중인 flash 메시지가 있으면 제외)
+    etag = f'lawn-{current_user.id}-{current_year}-{version}-{get_template_version()}'
+    if '_flashes' not in session and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        lawn_html = render_lawn_fragment('large', current_year, version)
+        response = make_response(render_template('lawn.html', lawn_html=lawn_html))
+
+    response.set_etag(etag, weak=True)
+    if updated_at:
+        response.last_modified = updated_at
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@main_bp.route('/archive/')
+@login_required
+def archive():
+    cursor = request.args.get('cursor', type=int)
+    todos, next_cursor = get_archive_page(current_user.id, cursor, ARCHIVE_PAGE_SIZE)
+    return render_template('archive.html', todos=todos, next_cursor=next_cursor)
+
+@main_bp.route('/archive/<int:todo_id>/restore/', methods=['POST'])
+@login_required
+def restore_todo(todo_id):
+    # 되돌리기 폼이 두 번 제출되어도 두 번째 요청은 첫 번째가 커밋한 뒤 행이 없음을 보고 404 가 됩니다.
+    archived = _get_for_update(TodoArchive, todo_id)
+    if archived is None:
+        abort(404)
+    if archived.user_id != current_user.id:
+        flash('권한이 없습니다.', 'danger')
+        return redirect(url_for('main.archive'))
+    restore_archived_todo(archived)
+    db.session.commit()
+    flash('할 일을 목록으로 되돌렸습니다.', 'success')
+    return redirect(url_for('main.archive', cursor=request.args.get('cursor')))
 
 @main_bp.route('/add/', methods=['POST'])
 @login_required
@@ -58,9 +185,12 @@ def add_todo():
         content=content,
         user_id=current_user.id,
         due_date=due_date,
-        important=important
+        important=important,
+        version=next_change_version(current_user.id)
     )
     db.session.add(new_todo)
+    db.session.flush()
+    index_todo(new_todo)
     db.session.commit()
     return jsonify({'success': True, 'todo': new_todo.to_dict()}), 201
 
@@ -68,7 +198,7 @@ def add_todo():
 @login_required
 def edit_todo(todo_id):
     todo = Todo.query.get_or_404(todo_id)
-    if todo.author != current_user:
+    if todo.user_id != current_user.id:
         flash('수정 권한이 없습니다.', 'danger')
         return redirect(url_for('main.index'))
 
@@ -81,6 +211,7 @@ def edit_todo(todo_id):
             flash('내용을 입력해주세요.', 'danger')
             return render_template('edit_todo.html', todo=todo)
 
+        content_changed = todo.content != content
         todo.content = content
         todo.important = important
         
@@ -97,24 +228,48 @@ def edit_todo(todo_id):
         else:
             todo.due_date = None
 
+        todo.version = next_change_version(todo.user_id)
+        if content_changed:
+            reindex_todo(todo)
         db.session.commit()
         flash('할 일이 성공적으로 수정되었습니다.', 'success')
         return redirect(url_for('main.index'))
 
     return render_template('edit_todo.html', todo=todo)
 
+def _get_for_update(model, todo_id):
+    # 행 잠금을 걸고 읽어, 같은 할 일에 동시에 들어온 토글/삭제가 같은 상태를 보고
+    # 잔디밭 집계를 두 번 바꾸지 않게 합니다. (커밋할 때 잠금이 풀림)
+    return db.session.execute(
+        db.select(model).where(model.id == todo_id).with_for_update()
+    ).scalar_one_or_none()
+
 @main_bp.route('/complete/<int:todo_id>/', methods=['POST'])
 @login_required
 def complete_todo(todo_id):
-    todo = Todo.query.get_or_404(todo_id)
-    if todo.author != current_user:
+    todo = _get_for_update(Todo, todo_id)
+    if todo is None:
+        # 보관된 할 일의 완료를 취소하면 todo 로 되돌립니다.
+        archived = _get_for_update(TodoArchive, todo_id)
+        if archived is None:
+            abort(404)
+        if archived.user_id != current_user.id:
+            return jsonify({'success': False, 'error': '권한이 없습니다.'}), 403
+        todo = restore_archived_todo(archived)
+        db.session.commit()
+        return jsonify({'success': True, 'completed': todo.completed, 'restored': True, 'todo': todo.to_dict()})
+    if todo.user_id != current_user.id:
         return jsonify({'success': False, 'error': '권한이 없습니다.'}), 403
     
     todo.completed = not todo.completed
     if todo.completed:
         todo.completed_at = datetime.utcnow()
+        bump_daily_completion(todo.user_id, todo.completed_at.date(), 1)
     else:
+        if todo.completed_at:
+            bump_daily_completion(todo.user_id, todo.completed_at.date(), -1)
         todo.completed_at = None
+    todo.version = next_change_version(todo.user_id)
         
     db.session.commit()
     return jsonify({'success': True, 'completed': todo.completed})
@@ -122,9 +277,15 @@ def complete_todo(todo_id):
 @main_bp.route('/delete/<int:todo_id>/', methods=['POST'])
 @login_required
 def delete_todo(todo_id):
-    todo = Todo.query.get_or_404(todo_id)
-    if todo.author != current_user:
+    todo = _get_for_update(Todo, todo_id)
+    if todo is None:
+        abort(404)
+    if todo.user_id != current_user.id:
         return jsonify({'success': False, 'error': '권한이 없습니다.'}), 403
+    if todo.completed_at:
+        bump_daily_completion(todo.user_id, todo.completed_at.date(), -1)
+    add_tombstones(todo.user_id, [todo.id], next_change_version(todo.user_id))
+    unindex_todos(todo.user_id, [todo.id])
     db.session.delete(todo)
     db.session.commit()
     return jsonify({'success': True})
@@ -133,8 +294,76 @@ def delete_todo(todo_id):
 @login_required
 def important_todo(todo_id):
     todo = Todo.query.get_or_404(todo_id)
-    if todo.author != current_user:
+    if todo.user_id != current_user.id:
         return jsonify({'success': False, 'error': '권한이 없습니다.'}), 403
     todo.important = not todo.important
+    todo.version = next_change_version(todo.user_id)
     db.session.commit()
     return jsonify({'success': True, 'important': todo.important})
+
+@main_bp.route('/batch/', methods=['POST'])
+@login_required
+def batch_todos():
+    if not request.is_json:
+        return jsonify({"error": "Invalid request"}), 400
+
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': '작업 목록이 비어 있습니다.'}), 400
+
+    total_ids = 0
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+            return jsonify({'error': '지원하지 않는 작업입니다.'}), 400
+        ids = operation.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({'error': 'ids 는 정수 목록이어야 합니다.'}), 400
+        total_ids += len(ids)
+    if total_ids > BATCH_MAX_IDS:
+        return jsonify({'error': f'한 번에 최대 {BATCH_MAX_IDS}개까지 처리할 수 있습니다.'}), 400
+
+    results = apply_todo_batch(current_user.id, operations)
+    db.session.commit()
+    return jsonify({'success': True, 'results': results})
+
+@main_bp.route('/export/')
+@login_required
+def export_todos():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': '지원하지 않는 형식입니다.'}), 400
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    response = Response(stream_with_context(iter_export(current_user.id, fmt)),
+                        content_type=f'{mimetype}; charset=utf-8')
+    response.headers['Content-Disposition'] = f'attachment; filename=lawn-todo-export.{fmt}'
+    return response
+
+@main_bp.route('/import/', methods=['POST'])
+@login_required
+def import_todos_route():
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': '업로드할 파일을 선택해주세요.'}), 400
+
+    fmt = request.form.get('format') or (upload.filename or '').rsplit('.', 1)[-1].lower()
+    if fmt == 'jsonl':
+        fmt = 'ndjson'
+    if fmt not in FORMATS:
+        return jsonify({'error': '지원하지 않는 형식입니다.'}), 400
+
+    try:
+        imported = import_todos(current_user.id, upload.stream, fmt)
+    except ImportValidationError as e:
+        db.session.rollback()
+        return jsonify({
+            'error': str(e),
+            'errors': [{'line': line, 'error': message} for line, message in e.errors]
+        }), 400
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({'error': 'UTF-8 로 인코딩된 파일이어야 합니다.'}), 400
+
+    db.session.commit()
+    return jsonify({'success': True, 'imported': imported}), 201
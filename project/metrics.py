@@ -0,0 +1,235 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, Response, abort, current_app, g, has_request_context, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# METRICS_DIR 에 워커별 스냅샷을 쓰는 최소 간격(초)
+SNAPSHOT_INTERVAL = 5.0
+
+
+def _request_perf():
+    if has_request_context():
+        return g.get('_perf')
+    return None
+
+
+def record_timing(name, seconds):
+    """현재 요청의 Server-Timing 에 구간(name) 시간을 더합니다. 계측이 꺼져 있으면 아무것도 하지 않습니다."""
+    perf = _request_perf()
+    if perf is not None:
+        perf['spans'][name] = perf['spans'].get(name, 0.0) + seconds
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class PerfMetrics:
+    """SQLAlchemy 엔진 이벤트와 Flask 요청 훅으로 요청별 성능 지표를 수집합니다.
+
+    PERF_INSTRUMENTATION 이 켜져 있을 때만 등록됩니다. 요청마다 SQL 문 수/DB 시간,
+    템플릿 렌더링 시간, 핸들러 시간을 Server-Timing 헤더로 내보내고, 엔드포인트별
+    지연 시간 히스토그램을 /metrics 에서 Prometheus 형식으로 제공합니다.
+
+    지표는 프로세스(워커) 단위로 모이므로 모든 시계열에 worker(pid) 라벨을 붙입니다.
+    METRICS_DIR 이 설정되어 있으면(`flask serve` 는 자동으로 설정) 각 워커가 SNAPSHOT_INTERVAL
+    마다 그 디렉터리에 스냅샷을 쓰고, /metrics 는 어느 워커가 응답하든 모든 워커의 스냅샷을 내보냅니다.
+    """
+
+    def __init__(self, app=None):
+        self.slow_query_seconds = 0.2
+        self._lock = threading.Lock()
+        self._latency = defaultdict(_Histogram)
+        self._db_statements = defaultdict(int)
+        self._db_seconds = defaultdict(float)
+        self._template_seconds = defaultdict(float)
+        self.snapshot_dir = None
+        self._last_snapshot = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('PERF_INSTRUMENTATION'):
+            return
+        self.slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000.0
+        self.snapshot_dir = app.config.get('METRICS_DIR')
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render_template, app)
+        template_rendered.connect(self._template_rendered, app)
+        app.register_blueprint(metrics_bp)
+        app.extensions['perf_metrics'] = self
+
+    # --- SQLAlchemy ---
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_perf_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['_perf_query_start'].pop()
+        perf = _request_perf()
+        if perf is not None:
+            perf['db_count'] += 1
+            perf['db_time'] += elapsed
+        if elapsed >= self.slow_query_seconds:
+            endpoint = request.endpoint if has_request_context() else None
+            logger.warning('Slow query (%.1f ms, endpoint=%s): %s', elapsed * 1000, endpoint,
+                           ' '.join(statement.split())[:1000])
+
+    # --- Templates ---
+
+    def _before_render_template(self, sender, template, context, **extra):
+        perf = _request_perf()
+        if perf is not None:
+            perf['template_stack'].append(time.perf_counter())
+
+    def _template_rendered(self, sender, template, context, **extra):
+        perf = _request_perf()
+        if perf is not None and perf['template_stack']:
+            elapsed = time.perf_counter() - perf['template_stack'].pop()
+            # 중첩 렌더링은 바깥 구간에 이미 포함되므로 최상위만 더합니다.
+            if not perf['template_stack']:
+                perf['template_time'] += elapsed
+
+    # --- Requests ---
+
+    def _before_request(self):
+        g._perf = {
+            'start': time.perf_counter(),
+            'db_count': 0,
+            'db_time': 0.0,
+            'template_time': 0.0,
+            'template_stack': [],
+            'spans': {},
+        }
+
+    def _after_request(self, response):
+        perf = g.pop('_perf', None)
+        if perf is None:
+            return response
+
+        total = time.perf_counter() - perf['start']
+        endpoint = request.endpoint or 'unknown'
+        with self._lock:
+            self._latency[endpoint].observe(total)
+            self._db_statements[endpoint] += perf['db_count']
+            self._db_seconds[endpoint] += perf['db_time']
+            self._template_seconds[endpoint] += perf['template_time']
+
+        if self.snapshot_dir and perf['start'] - self._last_snapshot >= SNAPSHOT_INTERVAL:
+            self.write_snapshot()
+
+        timings = [
+            f'db;dur={perf["db_time"] * 1000:.1f};desc="{perf["db_count"]} queries"',
+            f'tpl;dur={perf["template_time"] * 1000:.1f}',
+        ]
+        timings.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in perf['spans'].items())
+        timings.append(f'app;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    # --- Export ---
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'latency': {endpoint: {'buckets': list(hist.buckets), 'count': hist.count, 'sum': hist.sum}
+                            for endpoint, hist in self._latency.items()},
+                'db_statements': dict(self._db_statements),
+                'db_seconds': dict(self._db_seconds),
+                'template_seconds': dict(self._template_seconds),
+            }
+
+    def write_snapshot(self):
+        """이 워커의 지표를 METRICS_DIR/<pid>.json 에 원자적으로 씁니다."""
+        self._last_snapshot = time.perf_counter()
+        path = os.path.join(self.snapshot_dir, f'{os.getpid()}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning('Could not write metrics snapshot %s: %s', path, e)
+
+    def _worker_snapshots(self):
+        if not self.snapshot_dir:
+            return {str(os.getpid()): self.snapshot()}
+        self.write_snapshot()
+        snapshots = {}
+        for path in sorted(glob.glob(os.path.join(self.snapshot_dir, '*.json'))):
+            try:
+                with open(path) as f:
+                    snapshots[os.path.basename(path)[:-len('.json')]] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render_prometheus(self):
+        # 종료된 워커의 스냅샷도 남겨 두므로 카운터 합계(sum by endpoint)가 줄어들지 않습니다.
+        snapshots = self._worker_snapshots()
+        lines = [
+            '# HELP lawn_todo_request_duration_seconds Request handling time by endpoint.',
+            '# TYPE lawn_todo_request_duration_seconds histogram',
+        ]
+        for worker, snapshot in snapshots.items():
+            for endpoint, hist in sorted(snapshot['latency'].items()):
+                labels = f'endpoint="{endpoint}",worker="{worker}"'
+                for bound, count in zip(LATENCY_BUCKETS, hist['buckets']):
+                    lines.append(f'lawn_todo_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'lawn_todo_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+                lines.append(f'lawn_todo_request_duration_seconds_sum{{{labels}}} {hist["sum"]:.6f}')
+                lines.append(f'lawn_todo_request_duration_seconds_count{{{labels}}} {hist["count"]}')
+
+        for name, help_text, key in (
+            ('lawn_todo_db_statements_total', 'SQL statements executed by endpoint.', 'db_statements'),
+            ('lawn_todo_db_seconds_total', 'Time spent in SQL statements by endpoint.', 'db_seconds'),
+            ('lawn_todo_template_seconds_total', 'Time spent rendering templates by endpoint.', 'template_seconds'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for worker, snapshot in snapshots.items():
+                for endpoint, value in sorted(snapshot[key].items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}",worker="{worker}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+perf_metrics = PerfMetrics()
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    return Response(perf_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 
 db = SQLAlchemy()
 
@@ -8,6 +9,11 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False, index=True)
     password = db.Column(db.String(200), nullable=False)
+    # 잔디밭 데이터가 바뀔 때마다 증가 (렌더링 캐시 키 / ETag 용)
+    lawn_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    lawn_updated_at = db.Column(db.DateTime, nullable=True)
+    # 할 일이 추가/수정/삭제될 때마다 증가하는 사용자별 변경 버전 (델타 동기화용)
+    change_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     todos = db.relationship('Todo', backref='author', lazy=True)
 
 class Todo(db.Model):
@@ -19,10 +25,13 @@ class Todo(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True, index=True)
+    # 마지막으로 변경될 때의 user.change_version
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     __table_args__ = (
-        db.Index('ix_todo_user_id_completed_due_date_important_created_at', 
-                  'user_id', 'completed', 'due_date', 'important', 'created_at'),
+        db.Index('ix_todo_user_id_version', 'user_id', 'version'),
+        # SQLite 가 삭제/보관된 최대 id 를 재사용하지 않도록 (보관 테이블과 id 충돌 방지)
+        {'sqlite_autoincrement': True},
     )
 
     def to_dict(self):
@@ -33,5 +42,64 @@ class Todo(db.Model):
             'important': self.important,
             'due_date': self.due_date.strftime('%Y-%m-%d') if self.due_date else None,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None
+            'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None,
+            'version': self.version
         }
+
+# 할 일 목록 정렬(completed, due_date, important DESC, created_at DESC, id DESC) 과 같은 순서의 인덱스.
+# 목록 페이지는 이 인덱스의 구간을 정렬 없이 순서대로 읽습니다. (MariaDB 10.8+ 는 DESC 인덱스를 그대로 사용)
+db.Index('ix_todo_list_order', Todo.user_id, Todo.completed, Todo.due_date,
+         Todo.important.desc(), Todo.created_at.desc(), Todo.id.desc())
+
+class DailyCompletion(db.Model):
+    # 잔디밭용 일별 완료 개수 집계 테이블 (todo.completed_at 변경 시 같은 트랜잭션에서 갱신)
+    __tablename__ = 'daily_completion'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class TodoTombstone(db.Model):
+    # 삭제된 할 일 기록 (델타 동기화 클라이언트에 삭제를 전달하기 위함)
+    __tablename__ = 'todo_tombstone'
+
+    id = db.Column(db.Integer, primary_key=True)
+    todo_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_todo_tombstone_user_id_version', 'user_id', 'version'),
+    )
+
+class TodoArchive(db.Model):
+    # 완료된 지 오래된 할 일을 옮겨 두는 보관 테이블 (todo 와 같은 id 를 유지)
+    # 잔디밭 집계(daily_completion)는 그대로 두므로 보관해도 잔디밭은 바뀌지 않습니다.
+    __tablename__ = 'todo_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(db.String(200), nullable=False)
+    completed = db.Column(db.Boolean, default=True)
+    important = db.Column(db.Boolean, default=False)
+    due_date = db.Column(db.Date, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return dict(Todo.to_dict(self), archived=True)
+
+class TodoSearchToken(db.Model):
+    # 할 일 내용 검색용 n-gram 역색인 (단어별 2-gram, 한 글자 단어는 그 글자)
+    # todo 와 todo_archive 의 할 일을 함께 색인합니다. (보관해도 id 가 같으므로 토큰을 그대로 둠)
+    # (user_id, token) 이 기본 키의 앞부분이라 검색은 사용자 범위 안의 인덱스 조회로 끝납니다.
+    __tablename__ = 'todo_search_token'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 대소문자/악센트를 구분하지 않는 collation 에서는 서로 다른 토큰이 기본 키에서 충돌하므로 binary 로 둡니다.
+    token = db.Column(db.String(8).with_variant(mysql.VARCHAR(8, collation='utf8mb4_bin'), 'mysql', 'mariadb'),
+                      primary_key=True)
+    todo_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
@@ -0,0 +1,229 @@
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateColumn
+
+from .models import db, DailyCompletion, TodoArchive, TodoSearchToken, TodoTombstone
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# 스키마를 바꿀 때마다 1 올리고 MIGRATIONS 에 마이그레이션 함수를 추가합니다.
+SCHEMA_VERSION = 8
+
+SCHEMA_LOCK_NAME = 'lawn_todo_schema'
+SCHEMA_LOCK_TIMEOUT = 60
+
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+# --- Migration helpers ---
+# 마이그레이션은 실행 당시의 스키마를 기준으로 고정되어야 하므로 모델 정의 대신 명시적인 컬럼을 사용합니다.
+
+def _add_column(conn, table_name, column):
+    existing = {c['name'] for c in inspect(conn).get_columns(table_name)}
+    if column.name in existing:
+        return
+    db.Table(table_name, db.MetaData(), column)
+    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+    table = conn.dialect.identifier_preparer.quote(table_name)
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {ddl}'))
+
+
+def _create_index(conn, table_name, index_name, *column_names):
+    if index_name in {i['name'] for i in inspect(conn).get_indexes(table_name)}:
+        return
+    table = db.Table(table_name, db.MetaData(), autoload_with=conn)
+    db.Index(index_name, *(table.c[name] for name in column_names)).create(conn)
+
+
+def _migrate_2(conn):
+    """잔디밭 일별 집계 테이블과 렌더링 캐시용 버전 컬럼."""
+    DailyCompletion.__table__.create(conn, checkfirst=True)
+    _add_column(conn, 'user', db.Column('lawn_version', db.Integer, nullable=False, server_default='0'))
+    _add_column(conn, 'user', db.Column('lawn_updated_at', db.DateTime, nullable=True))
+
+    # 기존 완료 기록으로 집계를 채웁니다.
+    todo = db.Table('todo', db.MetaData(), autoload_with=conn)
+    rollup = DailyCompletion.__table__
+    completed_day = db.func.date(todo.c.completed_at, type_=db.Date)
+    conn.execute(rollup.delete())
+    conn.execute(rollup.insert().from_select(
+        ['user_id', 'day', 'count'],
+        db.select(todo.c.user_id, completed_day, db.func.count(todo.c.id))
+        .where(todo.c.completed_at.isnot(None))
+        .group_by(todo.c.user_id, completed_day)
+    ))
+
+
+def _migrate_3(conn):
+    """델타 동기화용 변경 버전과 삭제 기록."""
+    _add_column(conn, 'user', db.Column('change_version', db.Integer, nullable=False, server_default='0'))
+    _add_column(conn, 'todo', db.Column('version', db.Integer, nullable=False, server_default='0'))
+    _create_index(conn, 'todo', 'ix_todo_user_id_version', 'user_id', 'version')
+    TodoTombstone.__table__.create(conn, checkfirst=True)
+
+
+def _backfill_search_tokens(conn, batch_size=1000):
+    tokens = TodoSearchToken.__table__
+    conn.execute(tokens.delete())
+    # todo_archive 는 5 단계에서 생기므로 있을 때만 색인합니다.
+    for table_name in ('todo', 'todo_archive'):
+        if not inspect(conn).has_table(table_name):
+            continue
+        table = db.Table(table_name, db.MetaData(), autoload_with=conn)
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                db.select(table.c.id, table.c.user_id, table.c.content)
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            batch = [{'user_id': row.user_id, 'token': token, 'todo_id': row.id}
+                     for row in rows for token in tokenize(row.content)]
+            if batch:
+                conn.execute(tokens.insert(), batch)
+            last_id = rows[-1].id
+
+
+def _migrate_4(conn):
+    """할 일 내용 검색용 토큰 테이블과 기존 할 일 색인."""
+    TodoSearchToken.__table__.create(conn, checkfirst=True)
+    _backfill_search_tokens(conn)
+
+
+def _migrate_5(conn):
+    """오래된 완료 할 일 보관 테이블."""
+    TodoArchive.__table__.create(conn, checkfirst=True)
+
+
+def _migrate_6(conn):
+    """단어의 마지막 글자 토큰을 추가한 토크나이저로 검색 색인을 다시 만듭니다."""
+    _backfill_search_tokens(conn)
+
+
+def _migrate_7(conn):
+    """목록 정렬 순서와 같은 방향(important/created_at/id DESC)의 목록 인덱스로 교체합니다."""
+    todo = db.Table('todo', db.MetaData(), autoload_with=conn)
+    indexes = {i.name: i for i in todo.indexes}
+    if 'ix_todo_list_order' not in indexes:
+        db.Index('ix_todo_list_order', todo.c.user_id, todo.c.completed, todo.c.due_date,
+                 todo.c.important.desc(), todo.c.created_at.desc(), todo.c.id.desc()).create(conn)
+    old = indexes.get('ix_todo_user_id_completed_due_date_important_created_at')
+    if old is not None:
+        old.drop(conn)
+
+
+def _migrate_8(conn):
+    """보관된 할 일도 검색되도록 todo_archive 까지 포함해 검색 색인을 다시 만듭니다."""
+    _backfill_search_tokens(conn)
+
+
+MIGRATIONS = {
+    2: _migrate_2,
+    3: _migrate_3,
+    4: _migrate_4,
+    5: _migrate_5,
+    6: _migrate_6,
+    7: _migrate_7,
+    8: _migrate_8,
+}
+
+
+# --- Version bookkeeping ---
+
+def read_version(conn):
+    """schema_version 테이블의 버전을 한 번의 쿼리로 읽습니다. 테이블이 없으면 None."""
+    try:
+        return conn.execute(text('SELECT version FROM schema_version')).scalar()
+    except SQLAlchemyError:
+        conn.rollback()
+        return None
+
+
+def _stamp(conn, version):
+    table = SchemaVersion.__table__
+    conn.execute(table.delete())
+    conn.execute(table.insert().values(version=version))
+
+
+@contextmanager
+def _schema_lock(conn):
+    # 여러 컨테이너가 동시에 업그레이드하지 않도록 MariaDB/MySQL 의 named lock 을 겁니다.
+    if conn.dialect.name not in ('mysql', 'mariadb'):
+        yield
+        return
+    acquired = conn.execute(text('SELECT GET_LOCK(:name, :timeout)'),
+                            {'name': SCHEMA_LOCK_NAME, 'timeout': SCHEMA_LOCK_TIMEOUT}).scalar()
+    if not acquired:
+        raise RuntimeError('스키마 잠금을 얻지 못했습니다. 다른 업그레이드가 진행 중인지 확인하세요.')
+    try:
+        yield
+    finally:
+        conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': SCHEMA_LOCK_NAME})
+
+
+def upgrade():
+    """스키마를 SCHEMA_VERSION 까지 올리고 (이전 버전, 현재 버전) 을 반환합니다.
+
+    빈 데이터베이스에는 전체 테이블을 만들고, schema_version 이 없는 기존 배포는
+    버전 1(user, todo 만 있던 스키마)로 간주해 이후 마이그레이션을 적용합니다.
+    """
+    with db.engine.connect() as conn:
+        with _schema_lock(conn):
+            current = read_version(conn)
+            if current is None:
+                tables = set(inspect(conn).get_table_names())
+                if 'todo' not in tables:
+                    db.metadata.create_all(bind=conn)
+                    _stamp(conn, SCHEMA_VERSION)
+                    conn.commit()
+                    return None, SCHEMA_VERSION
+                current = 1
+                SchemaVersion.__table__.create(conn, checkfirst=True)
+
+            start = current
+            for version in range(current + 1, SCHEMA_VERSION + 1):
+                logger.info('Applying schema migration %d', version)
+                MIGRATIONS[version](conn)
+                _stamp(conn, version)
+                conn.commit()
+            return start, SCHEMA_VERSION
+
+
+def check_schema(app):
+    """앱 시작 시 스키마 버전을 한 번의 쿼리로 확인합니다. DDL 은 실행하지 않습니다.
+
+    SCHEMA_CHECK 설정: 'warn'(기본, 경고만), 'strict'(버전이 다르면 예외), 'off'(확인 안 함).
+    """
+    mode = app.config.get('SCHEMA_CHECK', 'warn')
+    if mode == 'off':
+        return None
+
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                version = read_version(conn)
+        except SQLAlchemyError as e:
+            logger.warning('Could not check schema version: %s', e)
+            return None
+
+    app.extensions['schema_version'] = version
+    if version != SCHEMA_VERSION:
+        message = (f'Database schema version is {version}, expected {SCHEMA_VERSION}. '
+                   f"Run 'flask upgrade-db'.")
+        if mode == 'strict':
+            raise SchemaOutdated(message)
+        logger.warning(message)
+    return version
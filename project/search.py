@@ -0,0 +1,220 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+from .models import db, Todo, TodoArchive, TodoSearchToken
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE_MAX = 100
+SEARCH_MAX_WORDS = 8
+INDEX_BATCH_SIZE = 1000
+# 검색 결과로 읽는 컬럼 (todo 와 todo_archive 에 공통)
+_RESULT_FIELDS = ('id', 'content', 'completed', 'important', 'due_date', 'user_id',
+                  'created_at', 'completed_at', 'version')
+
+_WORD = re.compile(r'\w+')
+_LIKE_ESCAPE = '/'
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def _word_tokens(word):
+    if len(word) == 1:
+        return [word]
+    return [word[i:i + 2] for i in range(len(word) - 1)]
+
+
+def tokenize(text):
+    """내용을 검색 토큰 집합으로 바꿉니다.
+
+    단어의 2-gram 에 더해 마지막 글자를 한 글자 토큰으로 넣습니다. 나머지 글자는 모두 어떤 2-gram 의
+    첫 글자이므로, 한 글자 검색('다' → '운동하다')은 그 글자로 시작하는 토큰의 접두사 범위로 찾을 수 있습니다.
+    """
+    tokens = set()
+    for word in _WORD.findall(_normalize(text)):
+        tokens.update(_word_tokens(word))
+        tokens.add(word[-1])
+    return tokens
+
+
+# --- Index maintenance (호출한 쪽의 트랜잭션 안에서 실행) ---
+
+def index_todos(rows):
+    """(todo_id, user_id, content) 목록의 토큰을 executemany 로 추가합니다."""
+    batch = []
+    for todo_id, user_id, content in rows:
+        batch.extend({'user_id': user_id, 'token': token, 'todo_id': todo_id} for token in tokenize(content))
+        if len(batch) >= INDEX_BATCH_SIZE:
+            db.session.execute(db.insert(TodoSearchToken), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(TodoSearchToken), batch)
+
+
+def index_todo(todo):
+    index_todos([(todo.id, todo.user_id, todo.content)])
+
+
+def unindex_todos(user_id, todo_ids):
+    if todo_ids:
+        db.session.execute(db.delete(TodoSearchToken).where(
+            TodoSearchToken.user_id == user_id, TodoSearchToken.todo_id.in_(todo_ids)
+        ))
+
+
+def reindex_todo(todo):
+    unindex_todos(todo.user_id, [todo.id])
+    index_todo(todo)
+
+
+def index_todos_where(*conditions, model=Todo):
+    """조건에 맞는 할 일(model 은 Todo 또는 TodoArchive)을 id 순서로 INDEX_BATCH_SIZE 개씩 다시 읽어 색인하고, 색인한 개수를 반환합니다.
+
+    한 번에 한 배치만 메모리에 올리므로 가져오기/재구성처럼 행이 많아도 메모리 사용량이 일정합니다.
+    """
+    select = db.select(model.id, model.user_id, model.content).where(*conditions)
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select.where(model.id > last_id).order_by(model.id).limit(INDEX_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return count
+        index_todos(rows)
+        count += len(rows)
+        last_id = rows[-1].id
+
+
+def rebuild_search_index(user_id=None):
+    """todo 와 todo_archive 로부터 검색 색인을 다시 만들고 색인한 할 일 수를 반환합니다. 커밋은 호출한 쪽에서 합니다."""
+    delete = db.delete(TodoSearchToken)
+    if user_id is not None:
+        delete = delete.where(TodoSearchToken.user_id == user_id)
+    db.session.execute(delete)
+    count = 0
+    for model in (Todo, TodoArchive):
+        conditions = [] if user_id is None else [model.user_id == user_id]
+        count += index_todos_where(*conditions, model=model)
+    return count
+
+
+# --- Query ---
+
+def _like_prefix(text):
+    for char in (_LIKE_ESCAPE, '%', '_'):
+        text = text.replace(char, _LIKE_ESCAPE + char)
+    return text + '%'
+
+
+def _matching_ids(i, single_char):
+    """i 번째 검색어에 맞는 todo_id. 단어는 w{i}(접두사 패턴) 또는 tokens{i}/count{i} 로 바인딩합니다."""
+    T = TodoSearchToken
+    user_id = db.bindparam('user_id', type_=db.Integer)
+    if single_char:
+        # 한 글자는 그 글자로 시작하는 토큰의 접두사 범위 검색
+        return db.select(T.todo_id).where(T.user_id == user_id,
+                                          T.token.like(db.bindparam(f'w{i}'), escape=_LIKE_ESCAPE))
+    tokens = db.bindparam(f'tokens{i}', expanding=True)
+    return db.select(T.todo_id).where(T.user_id == user_id, T.token.in_(tokens)).group_by(
+        T.todo_id
+    ).having(db.func.count(db.distinct(T.token)) == db.bindparam(f'count{i}', type_=db.Integer))
+
+
+def _candidate_select(model, matching, filters, paged):
+    stmt = db.select(*[getattr(model, field) for field in _RESULT_FIELDS],
+                     db.literal(model is TodoArchive).label('archived'))
+    stmt = stmt.where(model.user_id == db.bindparam('user_id', type_=db.Integer),
+                      model.id.in_(db.select(matching.c.todo_id)))
+    if 'completed' in filters:
+        stmt = stmt.where(model.completed == db.bindparam('completed', type_=db.Boolean))
+    if 'important' in filters:
+        stmt = stmt.where(model.important == db.bindparam('important', type_=db.Boolean))
+    if 'due_before' in filters:
+        stmt = stmt.where(model.due_date <= db.bindparam('due_before', type_=db.Date))
+    if 'due_after' in filters:
+        stmt = stmt.where(model.due_date >= db.bindparam('due_after', type_=db.Date))
+    if paged:
+        stmt = stmt.where(model.id < db.bindparam('before_id', type_=db.Integer))
+    return stmt
+
+
+@lru_cache(maxsize=64)
+def _search_statement(shape):
+    """검색 후보 쿼리. 모든 단어의 토큰에 맞는 id 를 CTE 로 한 번만 구한 뒤 todo 와 todo_archive 를
+    UNION ALL 로 함께 읽습니다.
+
+    shape 는 (단어별 한 글자 여부, 사용하는 필터, 보관함 포함 여부, 커서 유무) 로 종류가 많지 않으므로
+    한 번만 만들어 재사용합니다. 값은 모두 바인딩 파라미터로 넘깁니다.
+    """
+    single_chars, filters, include_archive, paged = shape
+    subqueries = [_matching_ids(i, single_char) for i, single_char in enumerate(single_chars)]
+    matching = (subqueries[0] if len(subqueries) == 1 else db.intersect(*subqueries)).cte('search_ids')
+    models = (Todo, TodoArchive) if include_archive else (Todo,)
+    parts = [_candidate_select(model, matching, filters, paged) for model in models]
+    stmt = parts[0] if len(parts) == 1 else db.union_all(*parts)
+    return stmt.order_by(db.desc('id')).limit(db.bindparam('limit', type_=db.Integer))
+
+
+def _candidates(params, shape):
+    """색인으로 고른 todo/todo_archive 후보를 id 역순으로 params['limit'] 개씩 읽어 하나씩 내보냅니다.
+
+    행은 세션에 붙지 않은 Todo/TodoArchive 객체로 돌려줍니다.
+    """
+    while True:
+        rows = db.session.execute(_search_statement(shape), params).all()
+        for row in rows:
+            model = TodoArchive if row.archived else Todo
+            yield model(**{field: getattr(row, field) for field in _RESULT_FIELDS})
+        if len(rows) < params['limit']:
+            return
+        params['before_id'] = rows[-1].id
+        shape = shape[:3] + (True,)
+
+
+def search_todos(user_id, query, completed=None, important=None, due_before=None, due_after=None,
+                 before_id=None, limit=SEARCH_PAGE_SIZE):
+    """검색어의 모든 단어를 부분 문자열로 포함하는 할 일을 최신순으로 반환합니다.
+
+    보관된 할 일(TodoArchive, to_dict 에 archived=True)도 함께 찾습니다. 보관해도 id 가 그대로이므로
+    두 테이블의 후보를 id 역순으로 합쳐 한 커서로 이어 받을 수 있습니다. 결과는 읽기 전용 객체입니다.
+    (todos, 다음 페이지 커서) 를 반환하며, 커서는 마지막 결과의 id 입니다.
+    """
+    words = _WORD.findall(_normalize(query))[:SEARCH_MAX_WORDS]
+    if not words:
+        return [], None
+
+    params = {'user_id': user_id, 'limit': limit + 1}
+    for i, word in enumerate(words):
+        if len(word) == 1:
+            params[f'w{i}'] = _like_prefix(word)
+        else:
+            tokens = set(_word_tokens(word))
+            params[f'tokens{i}'] = sorted(tokens)
+            params[f'count{i}'] = len(tokens)
+    filters = {'completed': completed, 'important': important, 'due_before': due_before, 'due_after': due_after}
+    filters = {name: value for name, value in filters.items() if value is not None}
+    params.update(filters)
+    if before_id is not None:
+        params['before_id'] = before_id
+    # 보관된 할 일은 모두 완료 상태입니다.
+    shape = (tuple(len(word) == 1 for word in words), tuple(sorted(filters)), completed is not False,
+             before_id is not None)
+
+    # 토큰 색인으로 후보를 좁힌 뒤, 후보의 내용을 토큰과 같은 방식(_normalize)으로 바꿔 실제 부분 문자열인지
+    # 확인합니다. DB 의 LIKE 는 정규화하지 않은 원문과 비교하므로 'Élan', 'ＡＢＣ' 같은 내용을 놓칩니다.
+    todos = []
+    for todo in _candidates(params, shape):
+        content = _normalize(todo.content)
+        if all(word in content for word in words):
+            todos.append(todo)
+            if len(todos) > limit:
+                break
+
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        next_cursor = todos[-1].id
+    return todos, next_cursor
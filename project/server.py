@@ -0,0 +1,116 @@
+import math
+import os
+
+from .models import db
+
+WORKER_CLASSES = {
+    'thread': 'gthread',
+    'gevent': 'gevent',
+}
+
+# gevent 모드에서 워커 하나가 동시에 잡을 수 있는 DB 커넥션 상한
+GEVENT_POOL_SIZE_MAX = 20
+
+
+def available_cpus():
+    """이 프로세스가 실제로 쓸 수 있는 CPU 수. (CPU affinity 와 cgroup v2 CPU 할당량을 반영)
+
+    os.cpu_count() 는 컨테이너 안에서도 호스트의 CPU 수를 돌려주므로 사용하지 않습니다.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def default_workers():
+    return available_cpus() * 2 + 1
+
+
+def engine_options(base_options, database_uri, worker_class, threads, connections, workers, max_connections):
+    """워커 프로세스 하나가 사용할 SQLAlchemy 커넥션 풀 설정을 계산합니다.
+
+    스레드 모드는 스레드마다 커넥션 하나, gevent 모드는 동시 그린렛 수와 상관없이
+    GEVENT_POOL_SIZE_MAX 로 제한하고 나머지는 pool_timeout 동안 대기합니다.
+    모든 워커의 pool_size + max_overflow 합이 max_connections(DB_MAX_CONNECTIONS)를
+    넘지 않도록 워커 수로 나눈 몫으로 다시 제한합니다.
+    """
+    per_worker = max_connections // workers
+    if per_worker < 1:
+        raise ValueError(f'DB_MAX_CONNECTIONS({max_connections})가 워커 수({workers})보다 작습니다.')
+
+    if worker_class == 'gevent':
+        pool_size = min(connections, GEVENT_POOL_SIZE_MAX)
+    else:
+        pool_size = threads
+    pool_size = min(pool_size, per_worker)
+
+    options = dict(base_options)
+    options.update(
+        pool_size=pool_size,
+        max_overflow=min(max(2, pool_size // 2), per_worker - pool_size),
+        pool_pre_ping=True,
+    )
+    options.setdefault('pool_recycle', 280)
+    if worker_class == 'gevent' and database_uri.startswith('mysql+mysqlconnector'):
+        # C 확장 드라이버는 gevent 허브를 막으므로 순수 파이썬 구현을 사용합니다.
+        connect_args = dict(options.get('connect_args', {}))
+        connect_args.setdefault('use_pure', True)
+        options['connect_args'] = connect_args
+    return options
+
+
+def dispose_engines(app):
+    """앱의 모든 커넥션 풀을 닫습니다."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _worker_exit(server, worker):
+    # 워커 종료(graceful shutdown 포함) 시 커넥션 풀을 정리합니다.
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        dispose_engines(app)
+
+
+def run_server(app_config, bind, workers, worker_class, threads, connections, timeout, graceful_timeout):
+    """gunicorn 으로 멀티 워커 서버를 실행합니다. 각 워커는 fork 이후 앱을 새로 만듭니다."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as e:
+        raise RuntimeError('gunicorn 이 설치되어 있지 않습니다. (pip install gunicorn)') from e
+
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': WORKER_CLASSES[worker_class],
+        'threads': threads,
+        'worker_connections': connections,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'preload_app': False,
+        'worker_exit': _worker_exit,
+        'accesslog': '-',
+    }
+    if worker_class == 'gevent':
+        options.pop('threads')
+
+    class LawnTodoServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from . import create_app
+            return create_app(app_config)
+
+    LawnTodoServer().run()
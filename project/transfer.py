@@ -0,0 +1,194 @@
+import codecs
+import csv
+import io
+import json
+from collections import Counter
+from datetime import date, datetime
+
+from .models import db, Todo, TodoArchive
+from .search import index_todos_where
+from .utils import bump_daily_completions, next_change_version
+
+EXPORT_FIELDS = ('id', 'content', 'completed', 'important', 'due_date', 'created_at', 'completed_at')
+EXPORT_YIELD_PER = 1000
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ROWS = 100000
+IMPORT_MAX_ERRORS = 20
+
+FORMATS = ('ndjson', 'csv')
+
+
+class ImportValidationError(ValueError):
+    """가져오기 데이터 검증 실패. errors 에 (줄 번호, 메시지) 목록을 담습니다."""
+
+    def __init__(self, errors):
+        super().__init__('가져오기 데이터에 오류가 있습니다.')
+        self.errors = errors
+
+
+def _format_row(row):
+    return {
+        'id': row.id,
+        'content': row.content,
+        'completed': bool(row.completed),
+        'important': bool(row.important),
+        'due_date': row.due_date.strftime('%Y-%m-%d') if row.due_date else None,
+        'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S') if row.created_at else None,
+        'completed_at': row.completed_at.strftime('%Y-%m-%d %H:%M:%S') if row.completed_at else None,
+    }
+
+
+def iter_export(user_id, fmt):
+    """사용자의 할 일(보관된 할 일 포함)을 yield_per 로 조금씩 읽어 NDJSON/CSV 문자열 조각으로 내보냅니다."""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+
+    for model in (Todo, TodoArchive):
+        query = db.select(*(getattr(model, field) for field in EXPORT_FIELDS)).where(
+            model.user_id == user_id
+        ).order_by(model.id).execution_options(yield_per=EXPORT_YIELD_PER)
+
+        for partition in db.session.execute(query).partitions():
+            for row in partition:
+                record = _format_row(row)
+                if writer is None:
+                    buffer.write(json.dumps(record, ensure_ascii=False))
+                    buffer.write('\n')
+                else:
+                    writer.writerow({k: ('' if v is None else v) for k, v in record.items()})
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y', 'on'):
+        return True
+    if text in ('', '0', 'false', 'no', 'n', 'off'):
+        return False
+    raise ValueError(f'불리언 값이 아닙니다: {value}')
+
+
+def _parse_date(value):
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('날짜 형식이 올바르지 않습니다.')
+
+
+def _parse_datetime(value):
+    if value in (None, ''):
+        return None
+    text = str(value).strip()
+    try:
+        if len(text) == 10:
+            return datetime.combine(date.fromisoformat(text), datetime.min.time())
+        return datetime.fromisoformat(text.replace('T', ' ').rstrip('Z'))
+    except ValueError:
+        raise ValueError('날짜/시간 형식이 올바르지 않습니다.')
+
+
+def _validate(record, now):
+    if not isinstance(record, dict):
+        raise ValueError('객체 형식이어야 합니다.')
+    content = record.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError('내용을 입력해주세요.')
+    if len(content) > 200:
+        raise ValueError('내용은 200자 이하여야 합니다.')
+
+    completed_at = _parse_datetime(record.get('completed_at'))
+    completed = _parse_bool(record.get('completed')) or completed_at is not None
+    if completed and completed_at is None:
+        completed_at = now
+
+    return {
+        'content': content,
+        'completed': completed,
+        'important': _parse_bool(record.get('important')),
+        'due_date': _parse_date(record.get('due_date')),
+        'created_at': _parse_datetime(record.get('created_at')) or now,
+        'completed_at': completed_at,
+    }
+
+
+def _iter_records(stream, fmt):
+    # SpooledTemporaryFile 은 3.11 이전에 TextIOWrapper 로 감쌀 수 없으므로 StreamReader 를 씁니다.
+    text = codecs.getreader('utf-8-sig')(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_no, ValueError('JSON 형식이 올바르지 않습니다.')
+
+
+def import_todos(user_id, stream, fmt):
+    """업로드 스트림을 한 줄씩 검증하며 IMPORT_BATCH_SIZE 단위 executemany 로 삽입합니다.
+
+    하나라도 오류가 있으면 ImportValidationError 를 발생시키며, 호출한 쪽에서 롤백해야 합니다.
+    잔디밭 집계, 검색 색인, 변경 버전은 마지막에 한 번에 반영합니다. 커밋은 호출한 쪽에서 합니다.
+    """
+    now = datetime.utcnow()
+    version = next_change_version(user_id)
+    lawn_deltas = Counter()
+    errors = []
+    batch = []
+    imported = 0
+
+    for line_no, record in _iter_records(stream, fmt):
+        if imported + len(batch) >= IMPORT_MAX_ROWS:
+            errors.append((line_no, f'한 번에 최대 {IMPORT_MAX_ROWS}개까지 가져올 수 있습니다.'))
+            break
+        try:
+            if isinstance(record, Exception):
+                raise record
+            row = _validate(record, now)
+        except ValueError as e:
+            errors.append((line_no, str(e)))
+            if len(errors) >= IMPORT_MAX_ERRORS:
+                break
+            continue
+
+        if errors:
+            # 오류가 이미 있으면 삽입하지 않고 검증만 계속합니다.
+            continue
+        row.update(user_id=user_id, version=version)
+        if row['completed_at']:
+            lawn_deltas[row['completed_at'].date()] += 1
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            db.session.execute(db.insert(Todo), batch)
+            imported += len(batch)
+            batch = []
+
+    if errors:
+        raise ImportValidationError(errors)
+    if batch:
+        db.session.execute(db.insert(Todo), batch)
+        imported += len(batch)
+
+    # 이번 가져오기로 들어간 행은 모두 같은 변경 버전이므로 (user_id, version) 인덱스로 배치씩 다시 읽어 색인합니다.
+    index_todos_where(Todo.user_id == user_id, Todo.version == version)
+    bump_daily_completions(user_id, lawn_deltas)
+    return imported
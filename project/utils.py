@@ -1,52 +1,466 @@
-from datetime import date, timedelta
+import base64
+import hashlib
+import json
+import time
+from datetime import date, datetime, timedelta
 from collections import OrderedDict
+from functools import lru_cache
+from flask import current_app, get_template_attribute
 from flask_login import current_user
-from .models import db, Todo
+from markupsafe import Markup
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .models import db, User, Todo, TodoArchive, DailyCompletion, TodoTombstone
+from .cache import LRUCache
+from .search import unindex_todos
+from .metrics import record_timing
 
-def get_lawn_data(year=None):
-    today = date.today()
-    if year is None:
-        year = today.year
+LAWN_FRAGMENT_CACHE_SIZE = 512
+TODO_PAGE_SIZE = 50
+TODO_PAGE_SIZE_MAX = 200
+CHANGES_LIMIT = 500
 
-    start_date = date(year, 1, 1)
-    end_date = date(year, 12, 31)
+_lawn_fragment_cache = LRUCache(maxsize=LAWN_FRAGMENT_CACHE_SIZE)
+
+
+def touch_lawn(user_id=None):
+    """잔디밭 버전을 올려 캐시된 렌더링 결과와 ETag 를 무효화합니다. user_id 가 없으면 전체 사용자."""
+    stmt = db.update(User).values(lawn_version=User.lawn_version + 1, lawn_updated_at=datetime.utcnow())
+    if user_id is not None:
+        stmt = stmt.where(User.id == user_id)
+    db.session.execute(stmt)
+
+
+def next_change_version(user_id):
+    """사용자의 변경 버전을 1 올리고 새 값을 반환합니다.
+
+    user 행을 UPDATE 로 잠그므로 같은 사용자의 동시 변경은 커밋 순서대로 번호를 받습니다.
+    """
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(change_version=User.change_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.query(User.change_version).filter(User.id == user_id).scalar()
+
+
+def get_change_version(user_id):
+    return db.session.query(User.change_version).filter(User.id == user_id).scalar()
+
+
+def add_tombstones(user_id, todo_ids, version):
+    """삭제된 할 일 id 들을 변경 버전과 함께 기록합니다."""
+    if todo_ids:
+        db.session.execute(
+            db.insert(TodoTombstone),
+            [{'todo_id': todo_id, 'user_id': user_id, 'version': version, 'deleted_at': datetime.utcnow()}
+             for todo_id in todo_ids]
+        )
+
+
+def get_changes(user_id, since):
+    """since 이후 변경/삭제된 할 일을 반환합니다. 변경이 너무 많으면 reset=True 로 전체 새로고침을 요청합니다."""
+    version = get_change_version(user_id)
+    if since >= version:
+        return {'version': version, 'todos': [], 'deleted': []}
+
+    todos = Todo.query.filter(
+        Todo.user_id == user_id, Todo.version > since, Todo.version <= version
+    ).order_by(Todo.version).limit(CHANGES_LIMIT + 1).all()
+    if len(todos) > CHANGES_LIMIT:
+        return {'version': version, 'reset': True, 'todos': [], 'deleted': []}
+
+    deleted = [todo_id for todo_id, in db.session.query(TodoTombstone.todo_id).filter(
+        TodoTombstone.user_id == user_id, TodoTombstone.version > since, TodoTombstone.version <= version
+    )]
+    return {'version': version, 'todos': [todo.to_dict() for todo in todos], 'deleted': deleted}
+
+
+def bump_daily_completion(user_id, day, delta):
+    """일별 완료 집계를 delta 만큼 증감합니다. 호출한 쪽의 트랜잭션 안에서 실행됩니다."""
+    bump_daily_completions(user_id, {day: delta})
+
+
+def bump_daily_completions(user_id, deltas):
+    """{날짜: 증감값} 을 한 번의 upsert 로 일별 완료 집계에 반영합니다."""
+    rows = [{'user_id': user_id, 'day': day, 'count': delta} for day, delta in deltas.items() if delta]
+    if not rows:
+        return
+
+    table = DailyCompletion.__table__
+    dialect = db.session.get_bind().dialect.name
 
-    completed_todos = db.session.query(db.func.date(Todo.completed_at), db.func.count(Todo.id)).filter(
-        Todo.user_id == current_user.id,
-        Todo.completed_at.isnot(None),
-        db.func.date(Todo.completed_at) >= start_date,
-        db.func.date(Todo.completed_at) <= end_date
-    ).group_by(db.func.date(Todo.completed_at)).all()
+    if dialect in ('mysql', 'mariadb'):
+        stmt = mysql_insert(table).values(rows)
+        db.session.execute(stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted['count']))
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(table).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={'count': table.c.count + stmt.excluded['count']}
+        ))
+    else:
+        for row in rows:
+            updated = db.session.execute(
+                table.update()
+                .where(table.c.user_id == user_id, table.c.day == row['day'])
+                .values(count=table.c.count + row['count'])
+            )
+            if not updated.rowcount:
+                db.session.execute(table.insert().values(**row))
 
-    completion_counts = {d: c for d, c in completed_todos}
+    touch_lawn(user_id)
 
+
+def _completion_counts_from_todos(user_id=None):
+    # 보관된 할 일도 잔디밭에 포함되므로 todo 와 todo_archive 를 함께 집계합니다.
+    sources = []
+    for model in (Todo, TodoArchive):
+        source = db.select(model.user_id, model.completed_at).where(model.completed_at.isnot(None))
+        if user_id is not None:
+            source = source.where(model.user_id == user_id)
+        sources.append(source)
+    completed = db.union_all(*sources).subquery()
+    completed_day = db.func.date(completed.c.completed_at, type_=db.Date)
+    return db.select(completed.c.user_id, completed_day, db.func.count()).group_by(
+        completed.c.user_id, completed_day
+    )
+
+
+def rebuild_daily_completion(user_id=None):
+    """todo/todo_archive 테이블로부터 일별 완료 집계를 다시 만듭니다. 커밋은 호출한 쪽에서 합니다."""
+    table = DailyCompletion.__table__
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    db.session.execute(delete)
+
+    source = _completion_counts_from_todos(user_id).subquery()
+    result = db.session.execute(
+        table.insert().from_select(['user_id', 'day', 'count'], db.select(source))
+    )
+    touch_lawn(user_id)
+    return result.rowcount
+
+
+def check_daily_completion(user_id=None):
+    """집계 테이블과 todo/todo_archive 테이블의 불일치 목록을 (user_id, day, 집계값, 실제값) 형태로 반환합니다."""
+    expected = {(u, d): c for u, d, c in db.session.execute(_completion_counts_from_todos(user_id))}
+
+    query = db.session.query(DailyCompletion.user_id, DailyCompletion.day, DailyCompletion.count)
+    if user_id is not None:
+        query = query.filter(DailyCompletion.user_id == user_id)
+    actual = {(u, d): c for u, d, c in query.all()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        stored, real = actual.get(key, 0), expected.get(key, 0)
+        if stored != real:
+            mismatches.append((key[0], key[1], stored, real))
+    return mismatches
+
+
+@lru_cache(maxsize=4)
+def _year_skeleton(year):
+    """연도별 잔디밭 달력 뼈대(주 단위 날짜 목록, 월별 주 수)를 만듭니다. 연도당 한 번만 계산됩니다."""
+    start_date = date(year, 1, 1)
+    end_date = date(year, 12, 31)
     start_of_grid = start_date - timedelta(days=(start_date.weekday() + 1) % 7)
     end_of_grid = end_date + timedelta(days=5 - end_date.weekday())
 
     weeks = []
     current_week = []
     day_cursor = start_of_grid
-    
-    while day_cursor <= end_of_grid:
-        count = completion_counts.get(day_cursor, 0)
-        level = 4 if count >= 10 else 3 if count >= 5 else 2 if count >= 3 else 1 if count > 0 else 0
-        
-        current_week.append({
-            "date": day_cursor,
-            "count": count,
-            "level": level,
-        })
 
+    while day_cursor <= end_of_grid:
+        current_week.append(day_cursor)
         if day_cursor.weekday() == 5:
-            weeks.append(current_week)
+            weeks.append(tuple(current_week))
             current_week = []
-        
         day_cursor += timedelta(days=1)
 
     month_weeks = OrderedDict()
     for week in weeks:
-        month_name = week[3]['date'].strftime('%b') if len(week) > 3 else week[0]['date'].strftime('%b')
+        month_name = week[3].strftime('%b') if len(week) > 3 else week[0].strftime('%b')
         month_weeks.setdefault(month_name, 0)
         month_weeks[month_name] += 1
-    
-    return weeks, month_weeks, today
+
+    return tuple(weeks), tuple(month_weeks.items())
+
+
+def get_lawn_data(year=None):
+    today = date.today()
+    if year is None:
+        year = today.year
+
+    start_date = date(year, 1, 1)
+    end_date = date(year, 12, 31)
+
+    completed_days = db.session.query(DailyCompletion.day, DailyCompletion.count).filter(
+        DailyCompletion.user_id == current_user.id,
+        DailyCompletion.day >= start_date,
+        DailyCompletion.day <= end_date
+    ).all()
+
+    completion_counts = {d: c for d, c in completed_days}
+
+    skeleton_weeks, month_items = _year_skeleton(year)
+
+    weeks = []
+    for skeleton_week in skeleton_weeks:
+        week = []
+        for day in skeleton_week:
+            count = completion_counts.get(day, 0)
+            level = 4 if count >= 10 else 3 if count >= 5 else 2 if count >= 3 else 1 if count > 0 else 0
+            week.append({
+                "date": day,
+                "count": count,
+                "level": level,
+            })
+        weeks.append(week)
+
+    return weeks, OrderedDict(month_items), today
+
+
+def get_lawn_version(user_id):
+    """(lawn_version, lawn_updated_at) 을 기본 키 조회 한 번으로 가져옵니다."""
+    return db.session.query(User.lawn_version, User.lawn_updated_at).filter(User.id == user_id).one()
+
+
+def get_template_version():
+    """배포 버전. 페이지 전체를 304 로 돌려주는 ETag 에 넣어, 템플릿이 바뀐 배포 후에는 새 페이지를 받게 합니다.
+
+    BUILD_ID 설정이 있으면 그 값을, 없으면 모든 템플릿 소스의 해시를 (앱마다 한 번 계산해) 사용합니다.
+    """
+    app = current_app._get_current_object()
+    version = app.extensions.get('template_version')
+    if version is None:
+        version = app.config.get('BUILD_ID')
+        if not version:
+            digest = hashlib.sha1()
+            for name in sorted(app.jinja_env.list_templates()):
+                source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, name)
+                digest.update(name.encode())
+                digest.update(source.encode())
+            version = digest.hexdigest()[:12]
+        app.extensions['template_version'] = version
+    return version
+
+
+def render_lawn_fragment(size='large', year=None, version=None):
+    """현재 사용자의 잔디밭 HTML 조각을 렌더링합니다.
+
+    (사용자, 연도, 잔디밭 버전, 크기) 를 키로 LRU 캐시에 보관하므로
+    todo 완료 상태가 바뀌어 버전이 올라가기 전까지는 다시 렌더링하지 않습니다.
+    """
+    if year is None:
+        year = date.today().year
+    if version is None:
+        version, _ = get_lawn_version(current_user.id)
+
+    key = (current_user.id, year, version, size)
+    html = _lawn_fragment_cache.get(key)
+    if html is None:
+        weeks, month_weeks, today = get_lawn_data(year)
+        started = time.perf_counter()
+        render_lawn = get_template_attribute('_lawn_graph.html', 'render_lawn')
+        html = Markup(render_lawn(weeks, month_weeks, today, size=size))
+        record_timing('lawn', time.perf_counter() - started)
+        _lawn_fragment_cache.set(key, html)
+    return html
+
+
+def encode_todo_cursor(todo):
+    """목록 정렬 키 (completed, due_date, important, created_at, id) 를 불투명한 커서 문자열로 만듭니다."""
+    key = [
+        bool(todo.completed),
+        todo.due_date.isoformat() if todo.due_date else None,
+        bool(todo.important),
+        todo.created_at.isoformat(),
+        todo.id,
+    ]
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_todo_cursor(cursor):
+    """encode_todo_cursor 의 역변환. 형식이 잘못되면 ValueError 를 발생시킵니다."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        completed, due_date, important, created_at, todo_id = json.loads(raw)
+        return (
+            bool(completed),
+            date.fromisoformat(due_date) if due_date else None,
+            bool(important),
+            datetime.fromisoformat(created_at),
+            int(todo_id),
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError('잘못된 커서입니다.') from e
+
+
+# 목록 정렬 순서대로 나눈 (completed, due_date 유무) 구간.
+# 날짜 없는 할 일이 뒤에 오도록(due_date IS NULL) 구간을 나누면, 각 구간 안의 정렬
+# (due_date, important DESC, created_at DESC, id DESC) 은 ix_todo_list_order 의 순서와 같습니다.
+_TODO_LIST_SEGMENTS = ((False, True), (False, False), (True, True), (True, False))
+
+
+def _todo_page_ranges(shape):
+    """커서 이후의 목록을 정렬 순서대로, 서로 겹치지 않는 인덱스 범위 조건 목록으로 나눕니다.
+
+    각 조건은 등호 접두사 + 한 컬럼의 범위라서 인덱스의 한 구간만 순서대로 읽습니다.
+    커서 값은 바인드 파라미터(due_date, created_at, todo_id)로 남겨 둡니다.
+    """
+    ranges = []
+    start = 0
+    if shape is not None:
+        completed, has_due_date, important = shape
+        start = _TODO_LIST_SEGMENTS.index((completed, has_due_date)) + 1
+        due_date = db.bindparam('due_date', type_=db.Date)
+        created_at = db.bindparam('created_at', type_=db.DateTime)
+        same_day = [
+            Todo.completed == (db.true() if completed else db.false()),
+            Todo.due_date == due_date if has_due_date else Todo.due_date.is_(None),
+        ]
+        # 같은 날짜/중요도 안에서 커서 이후
+        ranges.append(same_day + [
+            Todo.important == (db.true() if important else db.false()),
+            Todo.created_at <= created_at,
+            db.or_(Todo.created_at < created_at, Todo.id < db.bindparam('todo_id', type_=db.Integer)),
+        ])
+        # 같은 날짜의 중요하지 않은 할 일
+        if important:
+            ranges.append(same_day + [Todo.important == db.false()])
+        # 이후 날짜
+        if has_due_date:
+            ranges.append([Todo.completed == (db.true() if completed else db.false()), Todo.due_date > due_date])
+
+    for completed, has_due_date in _TODO_LIST_SEGMENTS[start:]:
+        ranges.append([
+            Todo.completed == (db.true() if completed else db.false()),
+            Todo.due_date.isnot(None) if has_due_date else Todo.due_date.is_(None),
+        ])
+    return ranges
+
+
+@lru_cache(maxsize=16)
+def _todo_page_statement(shape):
+    """목록 페이지 쿼리. 구간별로 limit 개씩만 인덱스 순서대로 읽어 UNION ALL 로 합칩니다.
+
+    shape 는 첫 페이지면 None, 아니면 커서의 (completed, due_date 유무, important) 로 종류가 몇 개
+    되지 않으므로 한 번만 만들어 재사용합니다.
+    """
+    order = (Todo.due_date.asc(), Todo.important.desc(), Todo.created_at.desc(), Todo.id.desc())
+    limit = db.bindparam('limit', type_=db.Integer)
+    parts = []
+    for i, conditions in enumerate(_todo_page_ranges(shape)):
+        part = db.select(Todo, db.literal(i).label('part')).where(
+            Todo.user_id == db.bindparam('user_id', type_=db.Integer), *conditions
+        ).order_by(*order).limit(limit).subquery()
+        parts.append(db.select(part))
+    page = db.union_all(*parts).subquery()
+    return db.select(aliased(Todo, page)).order_by(
+        page.c.part, page.c.due_date.asc(), page.c.important.desc(),
+        page.c.created_at.desc(), page.c.id.desc()
+    ).limit(limit)
+
+
+def get_todo_page(user_id, cursor=None, limit=TODO_PAGE_SIZE):
+    """커서(keyset) 기반으로 할 일 목록 한 페이지와 다음 페이지 커서를 반환합니다.
+
+    사용자의 할 일이 아무리 많아도 한 페이지에서 읽고 정렬하는 행 수는 (구간 수 x limit) 을 넘지 않습니다.
+    """
+    params = {'user_id': user_id, 'limit': limit + 1}
+    shape = None
+    if cursor:
+        completed, due_date, important, created_at, todo_id = decode_todo_cursor(cursor)
+        shape = (completed, due_date is not None, important)
+        params.update(created_at=created_at, todo_id=todo_id)
+        if due_date is not None:
+            params['due_date'] = due_date
+
+    todos = db.session.execute(_todo_page_statement(shape), params).scalars().all()
+
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        next_cursor = encode_todo_cursor(todos[-1])
+    return todos, next_cursor
+
+
+BATCH_OPERATIONS = ('complete', 'uncomplete', 'important', 'unimportant', 'delete')
+BATCH_MAX_IDS = 500
+
+
+def apply_todo_batch(user_id, operations):
+    """여러 할 일에 대한 작업 목록을 집합 단위 UPDATE/DELETE 로 한 트랜잭션 안에서 적용합니다.
+
+    operations 는 [{'op': 'complete', 'ids': [1, 2]}, ...] 형태이며, 순서대로 적용됩니다.
+    id 별 결과 목록을 반환합니다. 커밋은 호출한 쪽에서 합니다.
+    """
+    all_ids = {todo_id for operation in operations for todo_id in operation['ids']}
+    # 소유권 확인과 잔디밭 집계 보정에 필요한 컬럼만 한 번에 읽어옵니다.
+    # 동시에 같은 할 일을 바꾸는 요청이 같은 상태를 보고 집계를 두 번 바꾸지 않도록 행을 잠급니다.
+    state = {
+        row.id: {'completed': bool(row.completed), 'completed_at': row.completed_at, 'important': bool(row.important)}
+        for row in db.session.query(Todo.id, Todo.completed, Todo.completed_at, Todo.important).filter(
+            Todo.user_id == user_id, Todo.id.in_(all_ids)
+        ).with_for_update()
+    } if all_ids else {}
+
+    now = datetime.utcnow()
+    version = next_change_version(user_id)
+    lawn_deltas = {}
+    results = []
+
+    def owned(stmt, ids):
+        return stmt.where(Todo.user_id == user_id, Todo.id.in_(ids)).execution_options(synchronize_session=False)
+
+    for operation in operations:
+        op, ids = operation['op'], list(dict.fromkeys(operation['ids']))
+        present = [todo_id for todo_id in ids if todo_id in state]
+        results.extend({'id': todo_id, 'op': op, 'success': False, 'error': 'not_found'}
+                       for todo_id in ids if todo_id not in state)
+        if not present:
+            continue
+
+        if op == 'complete':
+            targets = [todo_id for todo_id in present if not state[todo_id]['completed']]
+            if targets:
+                db.session.execute(owned(db.update(Todo), targets).values(completed=True, completed_at=now, version=version))
+                lawn_deltas[now.date()] = lawn_deltas.get(now.date(), 0) + len(targets)
+            for todo_id in targets:
+                state[todo_id].update(completed=True, completed_at=now)
+        elif op == 'uncomplete':
+            targets = [todo_id for todo_id in present if state[todo_id]['completed']]
+            if targets:
+                db.session.execute(owned(db.update(Todo), targets).values(completed=False, completed_at=None, version=version))
+            for todo_id in targets:
+                completed_at = state[todo_id]['completed_at']
+                if completed_at:
+                    lawn_deltas[completed_at.date()] = lawn_deltas.get(completed_at.date(), 0) - 1
+                state[todo_id].update(completed=False, completed_at=None)
+        elif op in ('important', 'unimportant'):
+            db.session.execute(owned(db.update(Todo), present).values(important=(op == 'important'), version=version))
+            for todo_id in present:
+                state[todo_id]['important'] = op == 'important'
+        elif op == 'delete':
+            db.session.execute(owned(db.delete(Todo), present))
+            unindex_todos(user_id, present)
+            add_tombstones(user_id, present, version)
+            for todo_id in present:
+                completed_at = state.pop(todo_id)['completed_at']
+                if completed_at:
+                    lawn_deltas[completed_at.date()] = lawn_deltas.get(completed_at.date(), 0) - 1
+
+        for todo_id in present:
+            result = {'id': todo_id, 'op': op, 'success': True}
+            if op == 'delete':
+                result['deleted'] = True
+            else:
+                result['completed'] = state[todo_id]['completed']
+                result['important'] = state[todo_id]['important']
+            results.append(result)
+
+    bump_daily_completions(user_id, lawn_deltas)
+    return results
@@ -2,6 +2,12 @@ document.addEventListener('DOMContentLoaded', () => {
     const todoList = document.getElementById('todo-list');
     const addForm = document.getElementById('add-todo-form');
     const flashContainer = document.getElementById('flash-container');
+    const listSentinel = document.getElementById('todo-list-sentinel');
+    const selectedCount = document.getElementById('selected-count');
+    const searchForm = document.getElementById('search-form');
+    const searchResults = document.getElementById('search-results');
+    const searchMoreBtn = document.getElementById('search-more-btn');
+    let searchParams = null;
 
     // --- Helper Functions ---
 
@@ -45,6 +51,13 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // 오늘 날짜를 YYYY-MM-DD 문자열로 반환하는 함수
+    function todayString() {
+        const now = new Date();
+        const pad = (n) => String(n).padStart(2, '0');
+        return `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`;
+    }
+
     // 새로운 Todo 항목의 HTML을 생성하는 함수
     function createTodoElement(todo) {
         const li = document.createElement('li');
@@ -54,18 +67,18 @@ document.addEventListener('DOMContentLoaded', () => {
             li.classList.add('bg-warning-subtle');
         }
 
+        const dueDateClass = todo.due_date && todo.due_date < todayString() ? 'text-danger fw-bold' : 'text-muted';
         const dueDateHtml = todo.due_date && !todo.completed
-            ? `<small class="ms-2 due-date text-muted">(마감: ${todo.due_date})</small>`
+            ? `<small class="ms-2 due-date ${dueDateClass}">(마감: ${todo.due_date})</small>`
             : '';
 
         li.innerHTML = `
             <div>
+                <input class="form-check-input me-2 todo-select" type="checkbox" value="${todo.id}" aria-label="선택">
                 <a href="#" class="text-decoration-none me-2 important-btn" data-id="${todo.id}" title="중요도 변경">
                     <i class="${todo.important ? 'fa-solid fa-star text-warning' : 'fa-regular fa-star text-muted'}"></i>
                 </a>
-                <span class="todo-content" style="${todo.completed ? 'text-decoration: line-through; color: #6c757d;' : ''}">
-                    ${todo.content}
-                </span>
+                <span class="todo-content" style="${todo.completed ? 'text-decoration: line-through; color: #6c757d;' : ''}"></span>
                 ${dueDateHtml}
             </div>
             <div class="d-flex gap-2">
@@ -80,12 +93,164 @@ document.addEventListener('DOMContentLoaded', () => {
                 </a>
             </div>
         `;
+        // 내용은 사용자가 입력/가져온 값이므로 HTML 로 해석되지 않게 textContent 로 넣습니다.
+        li.querySelector('.todo-content').textContent = todo.content;
         return li;
     }
 
+    // 완료 상태를 화면에 반영하는 함수
+    function setCompleted(id, completed) {
+        const todoContent = document.querySelector(`#todo-${id} .todo-content`);
+        const dueDateEl = document.querySelector(`#todo-${id} .due-date`);
+        const completeBtn = document.querySelector(`#todo-${id} .complete-btn`);
+        if (!todoContent) return;
+        todoContent.style.textDecoration = completed ? 'line-through' : 'none';
+        todoContent.style.color = completed ? '#6c757d' : '';
+        completeBtn.classList.toggle('btn-success', !completed);
+        completeBtn.classList.toggle('btn-secondary', completed);
+        if(dueDateEl) dueDateEl.style.display = completed ? 'none' : '';
+    }
+
+    // 중요 표시를 화면에 반영하는 함수
+    function setImportant(id, important) {
+        const todoEl = document.getElementById(`todo-${id}`);
+        if (!todoEl) return;
+        const icon = todoEl.querySelector('.important-btn i');
+        icon.classList.toggle('fa-solid', important);
+        icon.classList.toggle('fa-regular', !important);
+        icon.classList.toggle('text-warning', important);
+        icon.classList.toggle('text-muted', !important);
+        todoEl.classList.toggle('bg-warning-subtle', important);
+    }
+
+    // 항목을 목록에서 제거하고, 비었으면 안내 문구를 보여주는 함수
+    function removeTodo(id) {
+        const todoEl = document.getElementById(`todo-${id}`);
+        if (todoEl) todoEl.remove();
+
+        if (todoList.children.length === 0) {
+            const li = document.createElement('li');
+            li.id = 'empty-todo-msg';
+            li.className = 'list-group-item text-center';
+            li.textContent = '할 일이 없습니다. 새 할 일을 추가해보세요!';
+            todoList.appendChild(li);
+        }
+    }
+
+    // 선택된 항목 수에 따라 일괄 작업 버튼을 갱신하는 함수
+    function selectedIds() {
+        return Array.from(todoList.querySelectorAll('.todo-select:checked')).map((el) => Number(el.value));
+    }
+
+    function updateBatchToolbar() {
+        const count = selectedIds().length;
+        selectedCount.textContent = count;
+        document.querySelectorAll('.batch-btn').forEach((btn) => { btn.disabled = count === 0; });
+    }
+
+    // 서버에서 받은 변경분(델타)을 목록에 반영하는 함수
+    function applyChanges(changes) {
+        changes.deleted.forEach((id) => {
+            if (document.getElementById(`todo-${id}`)) removeTodo(id);
+        });
+        changes.todos.forEach((todo) => {
+            const existing = document.getElementById(`todo-${todo.id}`);
+            const element = createTodoElement(todo);
+            if (existing) {
+                element.querySelector('.todo-select').checked = existing.querySelector('.todo-select').checked;
+                existing.replaceWith(element);
+            } else {
+                todoList.appendChild(element);
+                const emptyMsg = document.getElementById('empty-todo-msg');
+                if (emptyMsg) emptyMsg.remove();
+            }
+        });
+        updateBatchToolbar();
+    }
+
+    // 다른 탭/기기에서의 변경을 받아오는 루프
+    // 서버가 long-poll 을 허용하면(data-sync-wait > 0) 대기 요청을 이어서 보내고,
+    // 아니면 SYNC_INTERVAL 마다 조회합니다. 탭이 보이지 않는 동안은 조회하지 않습니다.
+    const SYNC_INTERVAL = 30000;
+    const SYNC_RETRY_DELAY = 5000;
+
+    // 대기 중인 조회 루프를 깨우는 함수. 숨겨졌던 탭이 다시 보이면 다음 주기를 기다리지 않고 바로 조회합니다.
+    let wakeSync = null;
+    document.addEventListener('visibilitychange', () => {
+        if (!document.hidden && wakeSync) wakeSync();
+    });
+
+    // ms 가 지나거나 탭이 다시 보일 때까지 기다립니다. ms 가 0 이면 탭이 보일 때까지만 기다립니다.
+    function pauseSync(ms) {
+        return new Promise((resolve) => {
+            wakeSync = resolve;
+            if (ms) setTimeout(resolve, ms);
+        });
+    }
+
+    async function syncChanges() {
+        let version = Number(todoList.dataset.syncVersion);
+        const wait = Number(todoList.dataset.syncWait) || 0;
+        while (true) {
+            if (document.hidden) await pauseSync(0);
+            try {
+                const response = await fetch(`/todos/changes/?since=${version}&wait=${wait}`, {
+                    headers: { 'Accept': 'application/json' }
+                });
+                if (!response.ok) throw new Error(response.statusText);
+                const changes = await response.json();
+                if (changes.reset) {
+                    window.location.reload();
+                    return;
+                }
+                applyChanges(changes);
+                version = changes.version;
+                if (wait === 0) await pauseSync(SYNC_INTERVAL);
+            } catch (error) {
+                await new Promise((resolve) => setTimeout(resolve, SYNC_RETRY_DELAY));
+            }
+        }
+    }
+
+    // 다음 페이지를 불러와 목록 끝에 붙이는 함수 (커서 기반 페이지네이션)
+    let loadingNextPage = false;
+    async function loadNextPage() {
+        const cursor = listSentinel.dataset.nextCursor;
+        if (!cursor || loadingNextPage) return;
+
+        loadingNextPage = true;
+        const data = await apiRequest(`/todos/?cursor=${encodeURIComponent(cursor)}`, 'GET');
+        loadingNextPage = false;
+        if (!data) return;
+
+        data.todos.forEach((todo) => {
+            // 이 화면에서 이미 추가된 항목은 건너뜁니다.
+            if (!document.getElementById(`todo-${todo.id}`)) {
+                todoList.appendChild(createTodoElement(todo));
+            }
+        });
+        listSentinel.dataset.nextCursor = data.next_cursor || '';
+    }
+
 
     // --- Event Handlers ---
 
+    // 목록 끝이 화면에 보이면 다음 페이지를 불러옵니다.
+    if (listSentinel) {
+        const observer = new IntersectionObserver(async (entries) => {
+            if (!entries.some((entry) => entry.isIntersecting)) return;
+            await loadNextPage();
+            // 다시 관찰을 시작해 센티널이 여전히 보이면 다음 페이지를 이어서 불러옵니다.
+            observer.unobserve(listSentinel);
+            if (listSentinel.dataset.nextCursor) observer.observe(listSentinel);
+        }, { rootMargin: '200px' });
+        observer.observe(listSentinel);
+    }
+
+    if (todoList.dataset.syncVersion !== undefined) {
+        syncChanges();
+    }
+
     // 할 일 추가 처리
     addForm.addEventListener('submit', async (e) => {
         e.preventDefault();
@@ -121,40 +286,140 @@ document.addEventListener('DOMContentLoaded', () => {
         if (target.classList.contains('complete-btn')) {
             const data = await apiRequest(`/complete/${id}`, 'POST');
             if (data && data.success) {
-                const todoContent = document.querySelector(`#todo-${id} .todo-content`);
-                const dueDateEl = document.querySelector(`#todo-${id} .due-date`);
-                todoContent.style.textDecoration = data.completed ? 'line-through' : 'none';
-                todoContent.style.color = data.completed ? '#6c757d' : '';
-                target.classList.toggle('btn-success');
-                target.classList.toggle('btn-secondary');
-                if(dueDateEl) dueDateEl.style.display = data.completed ? 'none' : '';
+                setCompleted(id, data.completed);
             }
         } else if (target.classList.contains('important-btn')) {
             const data = await apiRequest(`/important/${id}`, 'POST');
             if (data && data.success) {
-                const icon = target.querySelector('i');
-                icon.classList.toggle('fa-solid');
-                icon.classList.toggle('fa-regular');
-                icon.classList.toggle('text-warning');
-                icon.classList.toggle('text-muted');
-                document.getElementById(`todo-${id}`).classList.toggle('bg-warning-subtle', data.important);
+                setImportant(id, data.important);
             }
         } else if (target.classList.contains('delete-btn')) {
             if (confirm('정말로 이 할 일을 삭제하시겠습니까?')) {
                 const data = await apiRequest(`/delete/${id}`, 'POST');
                 if (data && data.success) {
-                    document.getElementById(`todo-${id}`).remove();
+                    removeTodo(id);
                     showFlashMessage('할 일이 삭제되었습니다.', 'info');
-                    
-                    if (todoList.children.length === 0) {
-                        const li = document.createElement('li');
-                        li.id = 'empty-todo-msg';
-                        li.className = 'list-group-item text-center';
-                        li.textContent = '할 일이 없습니다. 새 할 일을 추가해보세요!';
-                        todoList.appendChild(li);
-                    }
+                    updateBatchToolbar();
                 }
             }
         }
     });
-});
\ No newline at end of file
+
+    // 선택 체크박스 변경 처리
+    todoList.addEventListener('change', (e) => {
+        if (e.target.classList.contains('todo-select')) updateBatchToolbar();
+    });
+
+    // 마감이 지난 미완료 항목을 모두 선택
+    const selectOverdueBtn = document.getElementById('select-overdue-btn');
+    if (selectOverdueBtn) {
+        selectOverdueBtn.addEventListener('click', () => {
+            const today = todayString();
+            todoList.querySelectorAll('li[id^="todo-"]').forEach((li) => {
+                const dueDateEl = li.querySelector('.due-date');
+                const match = dueDateEl && dueDateEl.style.display !== 'none' && dueDateEl.textContent.match(/\d{4}-\d{2}-\d{2}/);
+                if (match && match[0] < today) li.querySelector('.todo-select').checked = true;
+            });
+            updateBatchToolbar();
+        });
+    }
+
+    // 선택 항목 일괄 처리 (한 번의 요청, 한 번의 트랜잭션)
+    document.querySelectorAll('.batch-btn').forEach((btn) => {
+        btn.addEventListener('click', async () => {
+            const ids = selectedIds();
+            const op = btn.dataset.op;
+            if (ids.length === 0) return;
+            if (op === 'delete' && !confirm(`선택한 ${ids.length}개의 할 일을 삭제하시겠습니까?`)) return;
+
+            const data = await apiRequest('/batch/', 'POST', { operations: [{ op, ids }] });
+            if (!data || !data.success) return;
+
+            let applied = 0;
+            data.results.forEach((result) => {
+                if (!result.success) return;
+                applied += 1;
+                if (result.deleted) {
+                    removeTodo(result.id);
+                    return;
+                }
+                setCompleted(result.id, result.completed);
+                setImportant(result.id, result.important);
+                const checkbox = document.querySelector(`#todo-${result.id} .todo-select`);
+                if (checkbox) checkbox.checked = false;
+            });
+            updateBatchToolbar();
+            showFlashMessage(`${applied}개의 할 일을 처리했습니다.`, 'success');
+        });
+    });
+
+    // 내용 검색 (서버의 검색 색인 사용, 더 보기로 다음 페이지)
+    function createSearchResultElement(todo) {
+        const li = document.createElement('li');
+        li.className = 'list-group-item d-flex justify-content-between align-items-center';
+        const span = document.createElement('span');
+        span.textContent = todo.content;
+        if (todo.completed) {
+            span.style.textDecoration = 'line-through';
+            span.style.color = '#6c757d';
+        }
+        if (todo.due_date) {
+            const small = document.createElement('small');
+            small.className = 'ms-2 text-muted';
+            small.textContent = `(마감: ${todo.due_date})`;
+            span.appendChild(small);
+        }
+        if (todo.archived) {
+            // 보관된 할 일은 수정할 수 없으므로 보관함으로 안내합니다.
+            const archived = document.createElement('a');
+            archived.href = '/archive/';
+            archived.className = 'btn btn-sm btn-outline-secondary';
+            archived.textContent = '보관됨';
+            li.append(span, archived);
+            return li;
+        }
+        const edit = document.createElement('a');
+        edit.href = `/edit/${todo.id}/`;
+        edit.className = 'btn btn-sm btn-warning';
+        edit.title = '수정';
+        edit.innerHTML = '<i class="fa-solid fa-pen"></i>';
+        li.append(span, edit);
+        return li;
+    }
+
+    async function runSearch(cursor) {
+        const params = new URLSearchParams(searchParams);
+        if (cursor) params.set('cursor', cursor);
+        const data = await apiRequest(`/search/?${params}`, 'GET');
+        if (!data) return;
+        if (!cursor) {
+            searchResults.innerHTML = '';
+            if (data.todos.length === 0) {
+                const li = document.createElement('li');
+                li.className = 'list-group-item text-center text-muted';
+                li.textContent = '검색 결과가 없습니다.';
+                searchResults.appendChild(li);
+            }
+        }
+        data.todos.forEach((todo) => searchResults.appendChild(createSearchResultElement(todo)));
+        searchMoreBtn.dataset.cursor = data.next_cursor || '';
+        searchMoreBtn.classList.toggle('d-none', !data.next_cursor);
+    }
+
+    if (searchForm) {
+        searchForm.addEventListener('submit', (e) => {
+            e.preventDefault();
+            const q = document.getElementById('search-input').value.trim();
+            if (!q) {
+                searchResults.innerHTML = '';
+                searchMoreBtn.classList.add('d-none');
+                return;
+            }
+            searchParams = { q };
+            const completed = document.getElementById('search-completed').value;
+            if (completed) searchParams.completed = completed;
+            runSearch(null);
+        });
+        searchMoreBtn.addEventListener('click', () => runSearch(searchMoreBtn.dataset.cursor));
+    }
+});